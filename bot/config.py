@@ -1,7 +1,9 @@
 import os
+from typing import Literal, Optional
+
 from dotenv import find_dotenv
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from pydantic import SecretStr, PostgresDsn, RedisDsn, conint
+from pydantic import SecretStr, PostgresDsn, RedisDsn, conint, confloat, model_validator
 
 
 class Settings(BaseSettings):
@@ -11,6 +13,15 @@ class Settings(BaseSettings):
     POSTGRES_DSN: PostgresDsn
     REDIS_DSN: RedisDsn
 
+    POSTGRES_POOL_SIZE: conint(ge=1, le=1000) = 10
+    POSTGRES_POOL_MAX_OVERFLOW: conint(ge=0, le=1000) = 10
+    POSTGRES_POOL_TIMEOUT: confloat(gt=0) = 30  # seconds to wait for a connection
+    POSTGRES_POOL_RECYCLE: int = 1800  # seconds; -1 to never recycle connections
+    POSTGRES_POOL_PREWARM: conint(ge=0, le=1000) = 2  # connections to open on startup
+    POSTGRES_POOL_SLOW_CHECKOUT: confloat(gt=0) = 0.1  # seconds; slower checkouts are logged
+    POSTGRES_STATEMENT_CACHE_SIZE: conint(ge=0) = 100  # asyncpg prepared statements per connection
+    POSTGRES_PGBOUNCER_TRANSACTION_MODE: bool = False  # disables named prepared statements
+
     LOG_DIRECTORY: str  # validation?
     LOG_FILENAME: str  # validation?
     LOG_MAXBYTES: conint(ge=1, le=1_000_000_000)
@@ -19,6 +30,41 @@ class Settings(BaseSettings):
     RESET_POSTGRES_ON_STARTUP: bool
     RESET_REDIS_ON_STARTUP: bool
 
+    ADMIN_TELEGRAM_IDS: list[int] = []
+
+    BOT_MODE: Literal["polling", "webhook"] = "polling"
+    TELEGRAM_API_URL: Optional[str] = None  # Bot API server other than api.telegram.org, e.g. a local fake
+
+    WEBHOOK_BASE_URL: Optional[str] = None  # public URL; if set, the webhook is registered on startup
+    WEBHOOK_PATH: str = "/webhook"
+    WEBHOOK_SECRET: Optional[SecretStr] = None
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: conint(ge=1, le=65535) = 8080
+    WEBHOOK_MAX_CONCURRENT_UPDATES: conint(ge=1, le=10_000) = 100
+
+    # throttle class ("message", "command", "callback") -> (updates per second, burst)
+    THROTTLING_LIMITS: dict[
+        Literal["message", "command", "callback"],
+        tuple[confloat(gt=0), conint(ge=1)]
+    ] = {"message": (1.0, 10), "command": (0.5, 5), "callback": (2.0, 10)}
+
+    USER_CACHE_TTL: conint(ge=0) = 300  # seconds
+
+    METRICS_HOST: str = "0.0.0.0"
+    METRICS_PORT: Optional[conint(ge=1, le=65535)] = None  # serves Prometheus `/metrics` if set
+
+    QUERY_BUDGET: Optional[conint(ge=0)] = None  # debug: warn about updates executing more SQL statements
+
+    RECURRENT_SCHEDULER_INTERVAL: conint(ge=1) = 60  # seconds
+    RECURRENT_SCHEDULER_BATCH_SIZE: conint(ge=1, le=10_000) = 100
+    RECURRENT_SCHEDULER_MAX_OCCURRENCES: conint(ge=1) = 1000  # per recurrent transaction per batch
+
+    @model_validator(mode="after")
+    def check_webhook_secret(self) -> "Settings":
+        if self.BOT_MODE == "webhook" and not self.WEBHOOK_SECRET:
+            raise ValueError("WEBHOOK_SECRET is required in webhook mode")
+        return self
+
     model_config = SettingsConfigDict(
         env_file=find_dotenv('.env'),
         env_file_encoding='utf-8',
@@ -1,13 +1,14 @@
 import datetime
 
 from typing import List, get_args
-from sqlalchemy import ForeignKey, Identity
+from sqlalchemy import ForeignKey, Identity, Index, UniqueConstraint, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql.functions import current_timestamp
-from sqlalchemy.dialects.postgresql import BIGINT, BOOLEAN, VARCHAR, INTEGER, NUMERIC, TIMESTAMP, ENUM
+from sqlalchemy.dialects.postgresql import BIGINT, BOOLEAN, VARCHAR, INTEGER, TIMESTAMP, DATE, ENUM
 
 from bot.db.base import Base
-from bot.db.types import AliasableSubtype, RecurrentPeriodUnit
+from bot.db.types import AliasableSubtype, RecurrentPeriodUnit, MoneyType
+from bot.money import Money
 
 
 class User(Base):
@@ -56,6 +57,11 @@ class Aliasable(Base):
 
 class Alias(Base):
     __tablename__ = "alias"
+    __table_args__ = (
+        UniqueConstraint("user_id", "number", name="uq_alias_user_id_number", deferrable=True, initially="IMMEDIATE"),
+        Index("uq_alias_user_id_lower_name", "user_id", text("lower(name)"), unique=True),
+        Index("ix_alias_aliasable_id", "aliasable_id"),
+    )
 
     alias_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -76,6 +82,9 @@ class Alias(Base):
 
 class Currency(Base):
     __tablename__ = "currency"
+    __table_args__ = (
+        UniqueConstraint("aliasable_id", name="uq_currency_aliasable_id"),
+    )
 
     currency_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -94,6 +103,11 @@ class Currency(Base):
 
 class Storage(Base):
     __tablename__ = "storage"
+    __table_args__ = (
+        UniqueConstraint("user_id", "number", name="uq_storage_user_id_number", deferrable=True, initially="IMMEDIATE"),
+        Index("uq_storage_user_id_lower_name", "user_id", text("lower(name)"), unique=True),
+        UniqueConstraint("aliasable_id", name="uq_storage_aliasable_id"),
+    )
 
     storage_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -135,8 +149,26 @@ class StorageCurrency(Base):
         return f"StorageCurrency(storage_id={self.storage_id!r}, currency_id={self.currency_id!r})"
 
 
+class StorageBalance(Base):
+    """Running balance of a storage in a given currency. Maintained incrementally on every transaction insert."""
+    __tablename__ = "storage_balance"
+
+    storage_id: Mapped[int] = mapped_column(ForeignKey("storage.storage_id"), primary_key=True)
+    currency_id: Mapped[int] = mapped_column(ForeignKey("currency.currency_id"), primary_key=True)
+    amount: Mapped[Money] = mapped_column(MoneyType, nullable=False)
+
+    def __repr__(self):
+        return (f"StorageBalance(storage_id={self.storage_id!r}, currency_id={self.currency_id!r}, "
+                f"amount={self.amount!r})")
+
+
 class Category(Base):
     __tablename__ = "category"
+    __table_args__ = (
+        UniqueConstraint("user_id", "number", name="uq_category_user_id_number", deferrable=True, initially="IMMEDIATE"),
+        Index("uq_category_user_id_lower_name", "user_id", text("lower(name)"), unique=True),
+        UniqueConstraint("aliasable_id", name="uq_category_aliasable_id"),
+    )
 
     category_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -158,6 +190,9 @@ class Category(Base):
 
 class UserDefault(Base):
     __tablename__ = "user_default"
+    __table_args__ = (
+        UniqueConstraint("user_id", name="uq_user_default_user_id"),
+    )
 
     user_default_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -176,6 +211,9 @@ class UserDefault(Base):
 
 class Transaction(Base):
     __tablename__ = "transaction"
+    __table_args__ = (
+        Index("ix_transaction_user_id_timestamp", "user_id", text('"timestamp" DESC'), text("transaction_id DESC")),
+    )
 
     transaction_id: Mapped[int] = mapped_column(
         BIGINT,
@@ -191,7 +229,7 @@ class Transaction(Base):
         nullable=False,
         server_default=current_timestamp()
     )
-    amount: Mapped[float] = mapped_column(NUMERIC(precision=15, scale=2), nullable=False)
+    amount: Mapped[Money] = mapped_column(MoneyType, nullable=False)
 
     user: Mapped["User"] = relationship("User", back_populates="transactions")
 
@@ -201,9 +239,29 @@ class Transaction(Base):
                 f"timestamp={self.timestamp!r}, amount={self.amount!r})")
 
 
+class MonthlyRollup(Base):
+    """Per-month totals of user's transactions by category and currency. Maintained incrementally on every insert."""
+    __tablename__ = "monthly_rollup"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("user.user_id"), primary_key=True)
+    month: Mapped[datetime.date] = mapped_column(DATE, primary_key=True)  # first day of the (UTC) month
+    category_id: Mapped[int] = mapped_column(ForeignKey("category.category_id"), primary_key=True)
+    currency_id: Mapped[int] = mapped_column(ForeignKey("currency.currency_id"), primary_key=True)
+    total: Mapped[Money] = mapped_column(MoneyType, nullable=False)
+    count: Mapped[int] = mapped_column(INTEGER, nullable=False)
+
+    def __repr__(self) -> str:
+        return (f"MonthlyRollup(user_id={self.user_id!r}, month={self.month!r}, category_id={self.category_id!r}, "
+                f"currency_id={self.currency_id!r}, total={self.total!r}, count={self.count!r})")
+
+
 # todo!
 class Recurrent(Base):
     __tablename__ = "recurrent"
+    __table_args__ = (
+        UniqueConstraint("user_id", "number", name="uq_recurrent_user_id_number", deferrable=True, initially="IMMEDIATE"),
+        Index("ix_recurrent_next_timestamp", "next_timestamp"),
+    )
 
     recurrent_id: Mapped[int] = mapped_column(
         INTEGER,
@@ -216,7 +274,7 @@ class Recurrent(Base):
     currency_id: Mapped[int] = mapped_column(ForeignKey("currency.currency_id"), nullable=False)
     number: Mapped[int] = mapped_column(INTEGER, nullable=False)
     name: Mapped[str] = mapped_column(VARCHAR(40), nullable=False)
-    amount: Mapped[float] = mapped_column(NUMERIC(precision=15, scale=2), nullable=False)
+    amount: Mapped[Money] = mapped_column(MoneyType, nullable=False)
     start_timestamp: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
     next_timestamp: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
     period: Mapped[int] = mapped_column(INTEGER, nullable=False)
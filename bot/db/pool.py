@@ -0,0 +1,61 @@
+import logging
+import time
+from typing import Any
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, PoolProxiedConnection
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutStats:
+    """Running totals of time spent waiting for a pool connection (including opening a new one)."""
+
+    __slots__ = ("count", "total_wait", "max_wait", "slow_count")
+
+    def __init__(self):
+        self.count = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow_count = 0
+
+    def add(self, wait: float, slow: bool) -> None:
+        self.count += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.slow_count += slow
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.count if self.count else 0.0
+
+    def __repr__(self) -> str:
+        return (f"CheckoutStats(count={self.count}, mean_wait={self.mean_wait * 1000:.2f}ms, "
+                f"max_wait={self.max_wait * 1000:.2f}ms, slow_count={self.slow_count})")
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    `AsyncAdaptedQueuePool` that times every checkout and logs the ones slower than `slow_checkout_threshold` seconds.
+    A slow checkout means the pool is exhausted (or Postgres/PgBouncer is slow to accept connections).
+    """
+
+    def __init__(self, *args: Any, slow_checkout_threshold: float = 0.1, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.slow_checkout_threshold = slow_checkout_threshold
+        self.checkout_stats = CheckoutStats()
+
+    def recreate(self) -> "TimedAsyncAdaptedQueuePool":
+        pool = super().recreate()
+        pool.slow_checkout_threshold = self.slow_checkout_threshold
+        return pool
+
+    def connect(self) -> PoolProxiedConnection:
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            wait = time.perf_counter() - started
+            slow = wait >= self.slow_checkout_threshold
+            self.checkout_stats.add(wait, slow)
+            if slow:
+                logger.warning(f"Waited {wait * 1000:.0f}ms for a DB connection ({self.status()})")
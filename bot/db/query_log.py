@@ -0,0 +1,108 @@
+"""
+Per-session SQL statement log, used to enforce a query budget per update and to spot N+1 patterns.
+
+A session gets a log with `start_query_log` (or `ensure_query_log`, which reuses the current one); every statement executed on a connection the session holds
+is then recorded (the connection is bound to the log in `after_begin` and unbound on pool checkin).
+Listeners are installed once with `install_query_logging`.
+"""
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Session
+
+_LOG_KEY = "query_log"
+
+_whitespace_pattern = re.compile(r"\s+")
+_literal_pattern = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|\?|\b\d+(?:\.\d+)?\b")
+_values_pattern = re.compile(r"VALUES \(\?(?:, \?)*\)(?:, \(\?(?:, \?)*\))*")
+
+
+def fingerprint(statement: str) -> str:
+    """Statement with literals and bound parameters replaced by `?`, so that repeated queries look the same."""
+    statement = _whitespace_pattern.sub(" ", statement).strip()
+    statement = _literal_pattern.sub("?", statement)
+    return _values_pattern.sub("VALUES (...)", statement)
+
+
+class QueryLog:
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        self.statements: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def fingerprints(self) -> List[Tuple[str, int]]:
+        """Distinct statement fingerprints with their counts, most repeated first."""
+        return Counter(fingerprint(s) for s in self.statements).most_common()
+
+    def report(self, max_length: int = 200) -> str:
+        return "\n".join(f"  {count} x {fp[:max_length]}" for fp, count in self.fingerprints())
+
+
+def _sync_session(session: Union[Session, AsyncSession]) -> Session:
+    return session.sync_session if isinstance(session, AsyncSession) else session
+
+
+def start_query_log(session: Union[Session, AsyncSession]) -> QueryLog:
+    """Starts recording statements executed by `session`. Must be called before the session begins."""
+    log = QueryLog()
+    _sync_session(session).info[_LOG_KEY] = log
+    return log
+
+
+def ensure_query_log(session: Union[Session, AsyncSession]) -> QueryLog:
+    """The log `session` is recording to, started if there is none, so that nested callers share one log."""
+    log = get_query_log(session)
+    return log if log is not None else start_query_log(session)
+
+
+def get_query_log(session: Union[Session, AsyncSession]) -> Optional[QueryLog]:
+    return _sync_session(session).info.get(_LOG_KEY)
+
+
+def _after_begin(session: Session, transaction, connection) -> None:
+    log = session.info.get(_LOG_KEY)
+    if log is not None:
+        connection.info[_LOG_KEY] = log
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    log = conn.info.get(_LOG_KEY)
+    if log is not None:
+        log.statements.append(statement)
+
+
+def _checkin(dbapi_connection, connection_record) -> None:
+    connection_record.info.pop(_LOG_KEY, None)
+
+
+def install_query_logging(engine: Union[Engine, AsyncEngine]) -> None:
+    """Idempotent."""
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    if not event.contains(Session, "after_begin", _after_begin):
+        event.listen(Session, "after_begin", _after_begin)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine.pool, "checkin", _checkin)
+
+
+@contextmanager
+def assert_max_queries(session: Union[Session, AsyncSession], max_queries: int) -> Iterator[QueryLog]:
+    """
+    Test helper: fails if more than `max_queries` statements are executed by `session` inside the block.
+    The engine must have `install_query_logging` applied, and the session must not have begun yet.
+    """
+    log = start_query_log(session)
+    try:
+        yield log
+    finally:
+        _sync_session(session).info.pop(_LOG_KEY, None)
+    if len(log) > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, {len(log)} were executed:\n{log.report()}")
@@ -1,4 +1,28 @@
-from typing import Literal
+from decimal import Decimal
+from typing import Literal, Optional
+
+from sqlalchemy.dialects.postgresql import NUMERIC
+from sqlalchemy.types import TypeDecorator
+
+from bot.money import Money
 
 AliasableSubtype = Literal["category", "storage", "currency"]
 RecurrentPeriodUnit = Literal["day", "week", "month", "year"]
+
+
+class MoneyType(TypeDecorator):
+    """`NUMERIC(15, 2)` column holding `Money`: bound as an exact Decimal, read back as integer cents."""
+
+    impl = NUMERIC(precision=15, scale=2)
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[Money], dialect) -> Optional[Decimal]:
+        if value is None:
+            return None
+        return value.to_decimal()
+
+    def process_result_value(self, value: Optional[Decimal], dialect) -> Optional[Money]:
+        if value is None:
+            return None
+        # NUMERIC(15, 2) values and their sums always have 2 decimal places, so no rounding is needed
+        return Money(int(value.scaleb(2)))
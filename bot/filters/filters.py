@@ -1,11 +1,13 @@
 import re
-from typing import get_args
+from typing import get_args, Union, Dict, Any
 from aiogram.filters import BaseFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
+from bot.config import config
 from bot.db.models import AliasableSubtype
 from bot.states import TransactionStates
+from bot.utils.transaction import TRANSACTION_PATTERN, parse_transaction_lines
 
 
 class NameFilter(BaseFilter):
@@ -42,7 +44,8 @@ class PeriodicityFilter(BaseFilter):
     }
 
     async def __call__(self, message: Message) -> bool:
-        return re.fullmatch(self.periodicity_pattern, message.text) is not None
+        match = re.fullmatch(self.periodicity_pattern, message.text)
+        return match is not None and int(match.group(1)) > 0
 
 
 class IntegerFilter(BaseFilter):
@@ -85,16 +88,18 @@ class AliasableSubtypeFilter(BaseFilter):
 
 
 class TransactionFilter(BaseFilter):
-    transaction_pattern = re.compile(
-        r"([+-]?\d+(?:\.\d{,2})?)"  # amount (required)
-        r"(?:/(\d+))?"  # months for installment payments (optional)
-        r"(?:\s+([\w\-.]+))?"  # currency (optional)
-        r"(?:\s+([\w\-.]+))?"  # storage (optional)
-        r"(?:\s+([\w\-.]+))?"  # category (optional)
-    )
-
-    async def __call__(self, message: Message) -> bool:
-        return re.fullmatch(self.transaction_pattern, message.text) is not None
+    """
+    Matches a message with a transaction, or several transactions one per line, if any of the lines is valid.
+    The message is parsed only here: the handler gets the result as `parsed_lines`
+    (see `bot.utils.transaction.parse_transaction_lines`).
+    """
+    transaction_pattern = TRANSACTION_PATTERN
+
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        parsed_lines = parse_transaction_lines(message.text)
+        if any(parsed is not None for _, parsed in parsed_lines):
+            return {"parsed_lines": parsed_lines}
+        return False
 
 
 class NotWaitingForTransactionFilter(BaseFilter):
@@ -102,3 +107,10 @@ class NotWaitingForTransactionFilter(BaseFilter):
     async def __call__(self, message: Message, state: FSMContext):
         state_ = await state.get_state()
         return state_ != TransactionStates.waiting_for_new_transaction
+
+
+class AdminFilter(BaseFilter):
+    """Matches messages from users listed in `ADMIN_TELEGRAM_IDS`"""
+
+    async def __call__(self, message: Message) -> bool:
+        return message.from_user is not None and message.from_user.id in config.ADMIN_TELEGRAM_IDS
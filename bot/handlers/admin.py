@@ -0,0 +1,50 @@
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from bot.filters.filters import AdminFilter
+from bot.services.repository import Repository
+
+router: Router = Router()
+router.message.filter(AdminFilter())
+logger = logging.getLogger(__name__)
+
+
+@router.message(
+    Command("rebuild_balances")
+)
+async def cmd_rebuild_balances(message: Message, repo: Repository):
+    """Handles /rebuild_balances command"""
+    await repo.rebuild_storage_balances()
+    logger.info(f"Storage balances rebuilt by {message.from_user.id}")
+    await message.answer("Storage balances rebuilt.")
+
+
+@router.message(
+    Command("rebuild_rollups")
+)
+async def cmd_rebuild_rollups(message: Message, repo: Repository):
+    """Handles /rebuild_rollups command"""
+    await repo.rebuild_monthly_rollups()
+    logger.info(f"Monthly rollups rebuilt by {message.from_user.id}")
+    await message.answer("Monthly rollups rebuilt.")
+
+
+@router.message(
+    Command("ban", "unban")
+)
+async def cmd_ban(message: Message, command: CommandObject, repo: Repository):
+    """Handles /ban and /unban commands"""
+    banned = command.command == "ban"
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer(f"Usage: /{command.command} <telegram_id>")
+        return
+    telegram_id = int(command.args.strip())
+    user_id = await repo.set_user_banned(telegram_id, banned=banned)
+    if user_id is None:
+        await message.answer("User not found.")
+        return
+    logger.info(f"User {user_id} (telegram_id={telegram_id}) {'banned' if banned else 'unbanned'} by {message.from_user.id}")
+    await message.answer(f"User {telegram_id} {'banned' if banned else 'unbanned'}.")
@@ -6,6 +6,7 @@ from aiogram.types import Message
 from bot.db.models import User
 from bot.filters.filters import AliasableSubtypeFilter, IntegerFilter, NameFilter
 from bot.services.repository import Repository
+from bot.services.snapshot import UserContext
 from bot.states import AliasStates, TransactionStates
 from bot.utils.list_models import get_alias_list, get_storage_list, get_category_list
 
@@ -95,9 +96,12 @@ async def currency_alphacode(message: Message, state: FSMContext, repo: Reposito
     AliasStates.waiting_for_alias_name,
     NameFilter()
 )
-async def alias_name(message: Message, state: FSMContext, repo: Repository, user: User):
+async def alias_name(message: Message, state: FSMContext, repo: Repository, user: User, user_ctx: UserContext):
     """Handles alias_name entry in the process of /add_alias command"""
     name = message.text
+    if user_ctx.snapshot.name_taken("alias", name):
+        await message.answer("Alias with this name already exists. Try another name:")
+        return
     state_data = await state.get_data()
     aliasable_number = state_data.get("aliasable_number", None)
     currency_id = state_data.get("currency_id", None)
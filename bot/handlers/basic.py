@@ -1,21 +1,29 @@
 import logging
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
 from aiogram import Router
-from aiogram.filters import CommandStart, Command, StateFilter
+from aiogram.filters import CommandStart, Command, CommandObject, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
 from bot.db.models import User
+from bot.services.report import month_of
 from bot.services.repository import Repository
+from bot.services.snapshot import UserContext
 # from bot.db.models import User
 # from bot.services.repository import Repository
 from bot.states import TransactionStates
 from bot.filters.filters import TransactionFilter, YesNoFilter, NotWaitingForTransactionFilter
-from bot.utils.parse_transaction import parse_and_add_transactions
+from bot.utils.list_models import get_balance_list, get_report
+from bot.utils.parse_transaction import add_parsed_transactions
+from bot.utils.transaction import ParsedTransaction
 
 router: Router = Router()
 logger = logging.getLogger(__name__)
 
+MAX_REPORTED_ERRORS = 20
+
 
 @router.message(
     CommandStart(),
@@ -31,12 +39,25 @@ async def cmd_start(message: Message, state: FSMContext):
     TransactionStates.waiting_for_new_transaction,
     TransactionFilter()
 )
-async def transaction(message: Message, repo: Repository, user: User):
+async def transaction(
+        message: Message,
+        parsed_lines: List[Tuple[int, Optional[ParsedTransaction]]],
+        repo: Repository,
+        user_ctx: UserContext
+):
     """
-    Handles transactions: standard storage transaction / money transfer between storages / installment payment
+    Handles transactions: standard storage transaction / money transfer between storages / installment payment.
+    A message can contain several transactions, one per line.
     """
-    await parse_and_add_transactions(message.text, user_id=user.user_id, repo=repo)
-    await message.answer("Transaction added!")
+    added, errors = await add_parsed_transactions(parsed_lines, snapshot=user_ctx.snapshot, repo=repo)
+    if not errors:
+        await message.answer("Transaction added!" if added == 1 else f"{added} transactions added!")
+        return
+    lines = [f"Transactions added: {added}." if added else "No transactions added."]
+    lines.extend(f"Line {i}: {error}" for i, error in errors[:MAX_REPORTED_ERRORS])
+    if len(errors) > MAX_REPORTED_ERRORS:
+        lines.append(f"...and {len(errors) - MAX_REPORTED_ERRORS} more invalid lines.")
+    await message.answer("\n".join(lines))
 
 
 @router.message(
@@ -68,16 +89,31 @@ async def cmd_cancel(message: Message, state: FSMContext):
     Command("balance"),
     TransactionStates.waiting_for_new_transaction
 )
-async def cmd_balance(message: Message):
+async def cmd_balance(message: Message, repo: Repository, user: User):
     """Handles /balance command"""
-
-    await message.answer("TBS")
+    balance_list = await get_balance_list(user.user_id, repo)
+    if balance_list:
+        await message.answer(balance_list)
+    else:
+        await message.answer("All storages are empty.")
 
 
 @router.message(
     Command("report"),
     TransactionStates.waiting_for_new_transaction
 )
-async def cmd_report(message: Message):
+async def cmd_report(message: Message, command: CommandObject, repo: Repository, user_ctx: UserContext):
     """Handles /report command"""
-    await message.answer("TBS")
+    if command.args:
+        try:
+            month = datetime.strptime(command.args.strip(), "%Y-%m").date()
+        except ValueError:
+            await message.answer("Usage: /report [YYYY-MM]")
+            return
+    else:
+        month = month_of(datetime.now(tz=timezone.utc))
+    report = await get_report(user_ctx.snapshot, month, repo)
+    if report:
+        await message.answer(f"Report for {month:%B %Y}:\n\n{report}")
+    else:
+        await message.answer(f"No transactions in {month:%B %Y}.")
@@ -6,6 +6,7 @@ from aiogram.types import Message
 from bot.db.models import User
 from bot.filters.filters import NameFilter, YesNoFilter, IntegerFilter
 from bot.services.repository import Repository
+from bot.services.snapshot import UserContext
 from bot.states import CategoryStates, TransactionStates
 from bot.utils.list_models import get_category_list
 
@@ -39,9 +40,12 @@ async def cmd_add_category(message: Message, state: FSMContext):
     CategoryStates.waiting_for_new_category_name,
     NameFilter()
 )
-async def category_name_to_add(message: Message, state: FSMContext):
+async def category_name_to_add(message: Message, state: FSMContext, user_ctx: UserContext):
     """Handles category_name entry after /add_category command"""
     category_name = message.text
+    if user_ctx.snapshot.name_taken("category", category_name):
+        await message.answer("Category with this name already exists. Try another name:")
+        return
     await state.update_data({"category_name": category_name})
     await message.answer(f"Should we account for this category when calculating balance?")
     await state.set_state(CategoryStates.waiting_for_new_category_factor_in)
@@ -95,9 +99,13 @@ async def category_number_to_edit(message: Message, state: FSMContext, repo: Rep
     CategoryStates.waiting_for_edited_category_name,
     NameFilter()
 )
-async def category_name_to_edit(message: Message, state: FSMContext):
+async def category_name_to_edit(message: Message, state: FSMContext, user_ctx: UserContext):
     """Handles category_name entry in the process of /edit_category command"""
     category_name = message.text
+    state_data = await state.get_data()
+    if user_ctx.snapshot.name_taken("category", category_name, exclude_number=state_data.get("category_number")):
+        await message.answer("Category with this name already exists. Try another name:")
+        return
     await state.update_data({"category_name": category_name})
     await message.answer(f"Should we account for this category when calculating balance?")
     await state.set_state(CategoryStates.waiting_for_edited_category_factor_in)
@@ -6,6 +6,7 @@ from aiogram.types import Message
 from bot.db.models import User
 from bot.filters.filters import IntegerFilter, NameFilter, YesNoFilter, DayOfTheMonthFilter
 from bot.services.repository import Repository
+from bot.services.snapshot import UserContext
 from bot.states import StorageStates, TransactionStates
 from bot.utils.list_models import get_storage_list
 
@@ -39,9 +40,12 @@ async def cmd_add_storage(message: Message, state: FSMContext):
     StorageStates.waiting_for_new_storage_name,
     NameFilter()
 )
-async def storage_name_to_add(message: Message, state: FSMContext):
+async def storage_name_to_add(message: Message, state: FSMContext, user_ctx: UserContext):
     """Handles storage_name entry after /add_storage command"""
     storage_name = message.text
+    if user_ctx.snapshot.name_taken("storage", storage_name):
+        await message.answer("Storage with this name already exists. Try another name:")
+        return
     await state.update_data({"storage_name": storage_name})
     await message.answer("Does this storage have a billing day?")
     await state.set_state(StorageStates.waiting_for_new_storage_is_credit_flag)
@@ -161,11 +165,14 @@ async def storage_number_to_edit(message: Message, state: FSMContext, repo: Repo
     StorageStates.waiting_for_edited_storage_name,
     NameFilter()
 )
-async def storage_name_to_edit(message: Message, state: FSMContext, repo: Repository, user: User):
+async def storage_name_to_edit(message: Message, state: FSMContext, repo: Repository, user: User, user_ctx: UserContext):
     """Handles storage_name_to_edit in the process of /edit_storage command"""
     state_data = await state.get_data()
     storage_number = state_data.get("storage_number")
     storage_name = message.text
+    if user_ctx.snapshot.name_taken("storage", storage_name, exclude_number=storage_number):
+        await message.answer("Storage with this name already exists. Try another name:")
+        return
     await repo.update_storage_by_number_for_user(user_id=user.user_id, number=storage_number, name=storage_name)
     await message.answer("Storage edited!")
     await state.set_state(TransactionStates.waiting_for_new_transaction)
@@ -3,16 +3,18 @@ from datetime import datetime
 
 from aiogram import Router
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 
 from bot.db.models import User
+from bot.keyboards import TransactionPageCallback
+from bot.money import Money
 from bot.filters.filters import NameFilter, IntegerFilter, FloatFilter, DateTimeFilter, PeriodicityFilter
 from bot.services.repository import Repository
 from bot.states import TransactionStates, RecurrentStates
 from bot.utils.transaction import assume_sign
 from bot.utils.list_models import (
-    get_transaction_list,
+    get_transaction_page,
     get_storage_list,
     get_category_list,
     get_recurrent_transaction_list
@@ -27,13 +29,24 @@ router = Router()
 )
 async def cmd_list_transactions(message: Message, repo: Repository, user: User):
     """Handles /list_transactions command"""
-    transactions_str = await get_transaction_list(user.user_id, repo)
+    transactions_str, keyboard = await get_transaction_page(user.user_id, repo)
     if transactions_str:
-        await message.answer(f"List of transactions:\n\n{transactions_str}")
+        await message.answer(f"List of transactions:\n\n{transactions_str}", reply_markup=keyboard)
     else:
         await message.answer("No transactions yet.")
 
 
+@router.callback_query(TransactionPageCallback.filter())
+async def transactions_page(callback: CallbackQuery, callback_data: TransactionPageCallback, repo: Repository, user: User):
+    """Handles newer / older page buttons of /list_transactions"""
+    transactions_str, keyboard = await get_transaction_page(user.user_id, repo, cursor=callback_data)
+    if transactions_str:
+        await callback.message.edit_text(f"List of transactions:\n\n{transactions_str}", reply_markup=keyboard)
+        await callback.answer()
+    else:
+        await callback.answer("No more transactions.")
+
+
 @router.message(
     Command("list_recurrent"),
     TransactionStates.waiting_for_new_transaction
@@ -83,7 +96,7 @@ async def recurrent_name(message: Message, state: FSMContext):
 async def recurrent_amount(message: Message, state: FSMContext):
     """Handles recurrent_amount entry in the process of /add_recurrent command"""
     amount = assume_sign(message.text)
-    await state.update_data({"recurrent_amount": amount})
+    await state.update_data({"recurrent_amount": amount.cents})  # FSM data is stored as JSON
     await message.answer("Provide the recurring transaction's currency alpha code:")
     await state.set_state(RecurrentStates.waiting_for_recurrent_currency)
 
@@ -159,7 +172,7 @@ async def recurrent_timestamp(message: Message, state: FSMContext, user: User, r
     timestamp = datetime.strptime(message.text, '%Y-%m-%d %H:%M')
     state_data = await state.get_data()
     name = state_data.get("recurrent_name")
-    amount = state_data.get("recurrent_amount")
+    amount = Money(state_data.get("recurrent_amount"))
     storage_number = state_data.get("recurrent_storage_number")
     storage = await repo.get_storage_by_number_for_user(user_id=user.user_id, number=storage_number)
     category_number = state_data.get("recurrent_category_number")
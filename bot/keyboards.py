@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class TransactionPageCallback(CallbackData, prefix="transactions"):
+    """Keyset cursor of a /list_transactions page. Timestamp is stored as microseconds since the epoch."""
+    direction: Literal["newer", "older"]
+    timestamp_us: int
+    transaction_id: int
+
+    @classmethod
+    def from_transaction(cls, direction: Literal["newer", "older"], transaction: dict) -> "TransactionPageCallback":
+        return cls(
+            direction=direction,
+            timestamp_us=(transaction["timestamp"] - EPOCH) // timedelta(microseconds=1),
+            transaction_id=transaction["transaction_id"]
+        )
+
+    @property
+    def keyset(self) -> tuple[datetime, int]:
+        return EPOCH + timedelta(microseconds=self.timestamp_us), self.transaction_id
+
+
+def transaction_page_keyboard(
+        transactions: list[dict],
+        has_newer: bool,
+        has_older: bool
+) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if has_newer:
+        buttons.append(InlineKeyboardButton(
+            text="« Newer",
+            callback_data=TransactionPageCallback.from_transaction("newer", transactions[0]).pack()
+        ))
+    if has_older:
+        buttons.append(InlineKeyboardButton(
+            text="Older »",
+            callback_data=TransactionPageCallback.from_transaction("older", transactions[-1]).pack()
+        ))
+    if not buttons:
+        return None
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
@@ -1,26 +1,42 @@
 import asyncio
+from typing import Optional, Tuple
+
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
 # from aiogram.fsm.storage.memory import SimpleEventIsolation
-from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from aiogram.fsm.storage.redis import DefaultKeyBuilder
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
 
 from bot.db.base import Base
 from bot.config import config
-from bot.middlewares.db import DatabaseSessionMiddleware
+from bot.db.query_log import install_query_logging
+from bot.middlewares.metrics import HandlerMetricsMiddleware
+from bot.middlewares.query_budget import QueryBudgetMiddleware
+from bot.middlewares.db import DatabaseSessionMiddleware, CommitBeforeRequestMiddleware
+from bot.middlewares.throttling import ThrottlingMiddleware
 from bot.middlewares.user import UserMiddleware
-from bot.handlers import basic, category, alias, storage, currency, transaction
+from bot.handlers import admin, basic, category, alias, storage, currency, transaction
+from bot.services.currency_registry import load_currency_registry
+from bot.services.metrics import TimedRedisStorage, instrument_engine, start_metrics_server
+from bot.services.report import ReportCache
+from bot.services.scheduler import RecurrentScheduler
+from bot.services.snapshot import SnapshotCache
+from bot.services.user_cache import UserCache
 from bot.set_commands import set_commands
-from bot.utils.db import init_database, drop_all_tables
+from bot.utils.db import create_engine, prewarm_pool, init_database, drop_all_tables
 from bot.utils.log import setup_logging
+from bot.webhook import run_webhook
 
 
-async def main():
-    engine = create_async_engine(
-        url=config.POSTGRES_DSN.unicode_string(),
-        echo=False,
-        connect_args={"server_settings": {"jit": "off"}},
-    )
+async def setup_storage() -> Tuple[AsyncEngine, async_sessionmaker[AsyncSession], TimedRedisStorage]:
+    """Connects to Postgres and Redis, creating missing tables and loading the currency registry."""
+    engine = create_engine(config)
+    instrument_engine(engine)
+    if config.QUERY_BUDGET is not None:
+        install_query_logging(engine)
 
     sessionmaker = async_sessionmaker(
         engine,
@@ -29,13 +45,26 @@ async def main():
     if config.RESET_POSTGRES_ON_STARTUP:
         await drop_all_tables(engine=engine)
     await init_database(metadata=Base.metadata, engine=engine, session_pool=sessionmaker)
+    await load_currency_registry(session_pool=sessionmaker)
+    await prewarm_pool(engine, connections=min(config.POSTGRES_POOL_PREWARM, config.POSTGRES_POOL_SIZE))
 
-    redis_storage = RedisStorage.from_url(
+    redis_storage = TimedRedisStorage.from_url(
         config.REDIS_DSN.unicode_string(),
         key_builder=DefaultKeyBuilder(with_bot_id=True)
     )
     if config.RESET_REDIS_ON_STARTUP:
         await redis_storage.redis.flushdb()
+    return engine, sessionmaker, redis_storage
+
+
+def build_dispatcher(
+        session_pool: async_sessionmaker[AsyncSession],
+        redis_storage: TimedRedisStorage,
+        report_cache: ReportCache
+) -> Dispatcher:
+    """Dispatcher with all middlewares and routers."""
+    snapshot_cache = SnapshotCache(redis=redis_storage.redis)
+    user_cache = UserCache(ttl=config.USER_CACHE_TTL)
 
     dp = Dispatcher(
         storage=redis_storage,
@@ -43,9 +72,20 @@ async def main():
         # events_isolation=SimpleEventIsolation()
     )
 
-    dp.update.middleware(DatabaseSessionMiddleware(session_pool=sessionmaker))
-    dp.message.middleware(UserMiddleware())
+    dp.update.middleware(ThrottlingMiddleware(redis=redis_storage.redis, limits=config.THROTTLING_LIMITS))
+    dp.update.middleware(DatabaseSessionMiddleware(
+        session_pool=session_pool,
+        snapshot_cache=snapshot_cache,
+        report_cache=report_cache,
+        user_cache=user_cache
+    ))
+    for observer in (dp.message, dp.callback_query):
+        observer.middleware(HandlerMetricsMiddleware())
+        if config.QUERY_BUDGET is not None:
+            observer.middleware(QueryBudgetMiddleware(budget=config.QUERY_BUDGET))
+        observer.middleware(UserMiddleware())
     dp.include_routers(
+        admin.router,
         basic.router,
         category.router,
         alias.router,
@@ -53,11 +93,49 @@ async def main():
         currency.router,
         transaction.router
     )
+    return dp
+
 
-    bot = Bot(token=config.BOT_TOKEN.get_secret_value(), default=DefaultBotProperties(parse_mode="HTML"))
+def build_bot(session: Optional[BaseSession] = None) -> Bot:
+    if session is None and config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    bot = Bot(
+        token=config.BOT_TOKEN.get_secret_value(),
+        session=session,
+        default=DefaultBotProperties(parse_mode="HTML")
+    )
+    bot.session.middleware(CommitBeforeRequestMiddleware())
+    return bot
+
+
+async def main():
+    engine, sessionmaker, redis_storage = await setup_storage()
+    report_cache = ReportCache(redis=redis_storage.redis)
+    dp = build_dispatcher(session_pool=sessionmaker, redis_storage=redis_storage, report_cache=report_cache)
+    bot = build_bot()
     await set_commands(bot)
 
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    scheduler = RecurrentScheduler(
+        session_pool=sessionmaker,
+        report_cache=report_cache,
+        interval=config.RECURRENT_SCHEDULER_INTERVAL,
+        batch_size=config.RECURRENT_SCHEDULER_BATCH_SIZE,
+        max_occurrences=config.RECURRENT_SCHEDULER_MAX_OCCURRENCES
+    )
+    scheduler.start()
+    metrics_runner = None
+    if config.METRICS_PORT:
+        metrics_runner = await start_metrics_server(host=config.METRICS_HOST, port=config.METRICS_PORT)
+    try:
+        if config.BOT_MODE == "webhook":
+            await run_webhook(dp, bot, config)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await scheduler.stop()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
 
 
 if __name__ == "__main__":
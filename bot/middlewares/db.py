@@ -1,17 +1,57 @@
 # todo: middleware to limit users to a list of IDs? Roza only?
 
-from typing import Callable, Awaitable, Dict, Any
+from contextvars import ContextVar
+from typing import Callable, Awaitable, Dict, Any, Optional, TYPE_CHECKING
+
 from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
 from aiogram.types import TelegramObject
 from sqlalchemy.ext.asyncio import async_sessionmaker, AsyncSession
 
+from bot.services.report import ReportCache
 from bot.services.repository import Repository
+from bot.services.snapshot import SnapshotCache
+from bot.services.user_cache import UserCache
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+
+_current_repo: ContextVar[Optional[Repository]] = ContextVar("current_repo", default=None)
+
+
+async def commit_current_session() -> None:
+    """
+    Commits DB work done so far while handling the current update, if there is any, and publishes cache invalidations.
+    The session starts a new transaction (checking out a connection again) only if it is used afterwards.
+    """
+    repo = _current_repo.get()
+    if repo is not None and repo.session.in_transaction():
+        await repo.session.commit()
+        await repo.publish_invalidations()
 
 
 class DatabaseSessionMiddleware(BaseMiddleware):
-    def __init__(self, session_pool: async_sessionmaker[AsyncSession]):
+    """
+    Provides handlers with `session` and `repo`.
+    The session checks out a pool connection only on the first query, and the transaction is committed
+    as soon as the handler is done, or earlier: before the first Telegram API request
+    (see `CommitBeforeRequestMiddleware`). Updates that never query the DB don't touch the pool at all.
+    """
+
+    def __init__(
+            self,
+            session_pool: async_sessionmaker[AsyncSession],
+            snapshot_cache: SnapshotCache,
+            report_cache: ReportCache,
+            user_cache: UserCache
+    ):
         super().__init__()
         self.session_pool = session_pool
+        self.snapshot_cache = snapshot_cache
+        self.report_cache = report_cache
+        self.user_cache = user_cache
 
     async def __call__(
             self,
@@ -19,7 +59,35 @@ class DatabaseSessionMiddleware(BaseMiddleware):
             event: TelegramObject,
             data: Dict[str, Any]
     ) -> Any:
-        async with self.session_pool.begin() as session:
+        async with self.session_pool() as session:
+            repo = Repository(
+                session,
+                snapshot_cache=self.snapshot_cache,
+                report_cache=self.report_cache,
+                user_cache=self.user_cache
+            )
             data["session"] = session
-            data["repo"] = Repository(session)
-            return await handler(event, data)
+            data["repo"] = repo
+            token = _current_repo.set(repo)
+            try:
+                result = await handler(event, data)
+                await commit_current_session()
+            finally:
+                _current_repo.reset(token)
+        return result
+
+
+class CommitBeforeRequestMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware committing the current update's DB transaction before any Telegram API request,
+    so that pool connections aren't held during network round trips to Telegram.
+    """
+
+    async def __call__(
+            self,
+            make_request: NextRequestMiddlewareType[TelegramType],
+            bot: "Bot",
+            method: TelegramMethod[TelegramType]
+    ) -> Response[TelegramType]:
+        await commit_current_session()
+        return await make_request(bot, method)
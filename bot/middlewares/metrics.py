@@ -0,0 +1,33 @@
+import time
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+
+from bot.services.metrics import HANDLER_DURATION, handler_name
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Observes handler latency, labelled `<router module>.<handler>` (e.g. `basic.transaction`).
+    Registered as the first inner middleware, so that the matched handler is known and the time spent
+    in the rest of the inner middlewares (user lookup) is included.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        handler_object: HandlerObject = data["handler"]
+        name = handler_name(handler_object.callback)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            HANDLER_DURATION.labels(name, status).observe(time.perf_counter() - started)
@@ -0,0 +1,41 @@
+import logging
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject
+
+from bot.db.query_log import ensure_query_log
+from bot.services.metrics import handler_name
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """
+    Debug aid: counts SQL statements executed while handling an update and logs a warning with statement
+    fingerprints (repeated ones first, which is what N+1 looks like) if there are more than `budget`.
+    Must be registered before `UserMiddleware` to account for the user lookup too. Shares the session's query log
+    with outer middlewares that started one (e.g. the load generator's `QueryCountMiddleware`).
+    """
+
+    def __init__(self, budget: int):
+        super().__init__()
+        self.budget = budget
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        log = ensure_query_log(data["session"])
+        try:
+            return await handler(event, data)
+        finally:
+            if len(log) > self.budget:
+                handler_object: HandlerObject = data["handler"]
+                logger.warning(
+                    f"{handler_name(handler_object.callback)} executed {len(log)} queries "
+                    f"(budget {self.budget}):\n{log.report()}"
+                )
@@ -1 +1,116 @@
-# todo: ThrottlingMiddleware
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Awaitable, Dict, Any, Optional, Tuple, Literal
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+ThrottleClass = Literal["message", "command", "callback"]
+
+# KEYS[1] - bucket key; ARGV[1] - rate (tokens per second); ARGV[2] - burst (bucket capacity).
+# Returns {allowed, retry_after_ms, notify}; `notify` is set for the first rejection after an allowed update.
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts', 'rejected')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed, retry_after, notify = 0, 0, 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rejected', 0)
+else
+    retry_after = math.ceil((1 - tokens) * 1000 / rate)
+    if bucket[3] ~= '1' then
+        notify = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now, 'rejected', 1)
+end
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, retry_after, notify}
+"""
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Per-user token bucket kept in Redis, one bucket per throttle class (plain messages, commands, callback queries).
+    `limits` maps a throttle class to (rate in updates per second, burst); classes without limits aren't throttled.
+    Must be registered before `DatabaseSessionMiddleware`, so that rejected updates never touch the DB.
+
+    A user not seen by this process for the time it takes to refill a bucket is considered idle
+    and let through without a Redis round trip.
+    """
+
+    def __init__(
+            self,
+            redis: Redis,
+            limits: Dict[ThrottleClass, Tuple[float, int]],
+            local_maxsize: int = 10_000
+    ):
+        super().__init__()
+        self.redis = redis
+        self.limits = limits
+        self.local_maxsize = local_maxsize
+        self._token_bucket = redis.register_script(TOKEN_BUCKET_LUA)
+        self._last_seen: OrderedDict[Tuple[ThrottleClass, int], float] = OrderedDict()
+
+    @staticmethod
+    def _throttle_class(event: Update) -> Optional[ThrottleClass]:
+        if event.message is not None:
+            return "command" if (event.message.text or "").startswith("/") else "message"
+        if event.callback_query is not None:
+            return "callback"
+        return None
+
+    def _is_idle(self, key: Tuple[ThrottleClass, int], refill_seconds: float) -> bool:
+        now = time.monotonic()
+        last_seen = self._last_seen.get(key)
+        self._last_seen[key] = now
+        self._last_seen.move_to_end(key)
+        while len(self._last_seen) > self.local_maxsize:
+            self._last_seen.popitem(last=False)
+        return last_seen is not None and now - last_seen >= refill_seconds
+
+    async def _reject(self, event: Update, notify: bool) -> None:
+        if event.callback_query is not None:
+            await event.callback_query.answer("Too many requests. Please slow down.")
+        elif notify:
+            await event.message.answer("Too many requests. Please slow down.")
+
+    async def __call__(
+            self,
+            handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+            event: Update,
+            data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        throttle_class = self._throttle_class(event)
+        if user is None or throttle_class not in self.limits:
+            return await handler(event, data)
+
+        rate, burst = self.limits[throttle_class]
+        if self._is_idle((throttle_class, user.id), refill_seconds=burst / rate):
+            return await handler(event, data)
+
+        try:
+            allowed, retry_after, notify = await self._token_bucket(
+                keys=[f"throttle:{throttle_class}:{user.id}"],
+                args=[rate, burst]
+            )
+        except RedisError as e:
+            logger.warning(f"Throttling check failed, letting the update through: {e!r}")
+            return await handler(event, data)
+
+        if allowed:
+            return await handler(event, data)
+        logger.debug(f"Throttled {throttle_class} from {user.id}, retry after {retry_after} ms")
+        await self._reject(event, notify=bool(notify))
@@ -1,7 +1,7 @@
 import logging
 from typing import Callable, Awaitable, Dict, Any
 from aiogram import BaseMiddleware
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 
 from bot.services.repository import Repository
 from bot.utils.db import add_and_init_user
@@ -12,21 +12,22 @@ logger = logging.getLogger(__name__)
 class UserMiddleware(BaseMiddleware):
     async def __call__(
             self,
-            handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
-            message: Message,
+            handler: Callable[[Message | CallbackQuery, Dict[str, Any]], Awaitable[Any]],
+            message: Message | CallbackQuery,
             data: Dict[str, Any]
     ) -> Any:
         repo: Repository = data.get("repo")
         telegram_id = message.from_user.id
-        user = await repo.get_user_by_telegram_id(telegram_id=telegram_id)
-        logger.info(f"Got message by {user}")
-        if not user:
+        user_ctx = await repo.load_user_context(telegram_id=telegram_id)
+        logger.debug(f"Got message by {user_ctx.user.user_id if user_ctx else None} (telegram_id={telegram_id})")
+        if not user_ctx:
             first_name = message.from_user.first_name
             user = await add_and_init_user(telegram_id=telegram_id, first_name=first_name, banned=False, repo=repo)
-            logger.info(f"Added {user} into database.")
-        if not user.banned:
-            data.update({"user": user})
+            if user:
+                logger.info(f"Added {user} into database.")
+            user_ctx = await repo.load_user_context(telegram_id=telegram_id)
+        if not user_ctx.user.banned:
+            data.update({"user": user_ctx.user, "user_ctx": user_ctx})
             return await handler(message, data)
         else:
-            pass  # todo: log: banned user tried to access db
-            # todo: ban filter on `update` middleware?
+            logger.debug(f"Ignored update from banned user {user_ctx.user.user_id}")
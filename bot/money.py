@@ -0,0 +1,111 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Union
+
+
+class Money:
+    """
+    Amount of money as an integer number of cents (hundredths of the currency unit). Immutable.
+    Stored in `NUMERIC(15, 2)` columns through `bot.db.types.MoneyType`; arithmetic and aggregation stay on ints.
+    """
+
+    __slots__ = ("cents",)
+
+    def __init__(self, cents: int):
+        object.__setattr__(self, "cents", cents)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @classmethod
+    def from_str(cls, text: str) -> "Money":
+        """'12.5' -> 12.50, '-3' -> -3.00. More than 2 decimal places are rounded half up."""
+        sign = text[0] if text[0] in "+-" else ""
+        whole, _, fraction = text[len(sign):].partition(".")
+        if len(fraction) > 2 or "e" in text.lower():
+            return cls.from_decimal(Decimal(text))
+        cents = int((whole or "0") + fraction.ljust(2, "0"))
+        return cls(-cents if sign == "-" else cents)
+
+    @classmethod
+    def from_decimal(cls, value: Decimal) -> "Money":
+        return cls(int(value.scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP)))
+
+    def to_decimal(self) -> Decimal:
+        return Decimal(self.cents).scaleb(-2)
+
+    def split(self, parts: int) -> List["Money"]:
+        """Splits into `parts` amounts differing by at most a cent, which add up exactly to this one."""
+        sign = -1 if self.cents < 0 else 1  # sign treated separately for proper integer division and modulo
+        part_cents, remaining_cents = divmod(abs(self.cents), parts)
+        return [Money(sign * (part_cents + (i < remaining_cents))) for i in range(parts)]
+
+    def __add__(self, other: "Money") -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents + other.cents)
+        return NotImplemented
+
+    def __radd__(self, other: Union["Money", int]) -> "Money":
+        if other == 0:  # makes `sum()` work
+            return self
+        return NotImplemented
+
+    def __sub__(self, other: "Money") -> "Money":
+        if isinstance(other, Money):
+            return Money(self.cents - other.cents)
+        return NotImplemented
+
+    def __mul__(self, other: int) -> "Money":
+        if isinstance(other, int):
+            return Money(self.cents * other)
+        return NotImplemented
+
+    __rmul__ = __mul__
+
+    def __neg__(self) -> "Money":
+        return Money(-self.cents)
+
+    def __abs__(self) -> "Money":
+        return Money(abs(self.cents))
+
+    def __bool__(self) -> bool:
+        return self.cents != 0
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Money):
+            return self.cents == other.cents
+        return NotImplemented
+
+    def __lt__(self, other: "Money") -> bool:
+        if isinstance(other, Money):
+            return self.cents < other.cents
+        return NotImplemented
+
+    def __le__(self, other: "Money") -> bool:
+        if isinstance(other, Money):
+            return self.cents <= other.cents
+        return NotImplemented
+
+    def __gt__(self, other: "Money") -> bool:
+        if isinstance(other, Money):
+            return self.cents > other.cents
+        return NotImplemented
+
+    def __ge__(self, other: "Money") -> bool:
+        if isinstance(other, Money):
+            return self.cents >= other.cents
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.cents)
+
+    def __str__(self) -> str:
+        # exact: cents / 100 is the double nearest to the amount, which rounds back to it for |cents| < 2 ** 53
+        return "%.2f" % (self.cents / 100)
+
+    def __format__(self, format_spec: str) -> str:
+        if format_spec in ("", ".2f"):  # what the bot uses; no need to go through Decimal
+            return "%.2f" % (self.cents / 100)
+        return format(self.to_decimal(), format_spec)
+
+    def __repr__(self) -> str:
+        return f"Money('{self}')"
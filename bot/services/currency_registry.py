@@ -0,0 +1,94 @@
+import logging
+from types import MappingProxyType
+from typing import Optional, Iterable, Iterator, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.db.models import Currency
+
+logger = logging.getLogger(__name__)
+
+
+class CurrencyRecord:
+    """Read-only counterpart of `Currency` model."""
+
+    __slots__ = ("currency_id", "aliasable_id", "name", "symbol", "alpha_code")
+
+    def __init__(self, currency_id: int, aliasable_id: int, name: str, symbol: str, alpha_code: str):
+        object.__setattr__(self, "currency_id", currency_id)
+        object.__setattr__(self, "aliasable_id", aliasable_id)
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "symbol", symbol)
+        object.__setattr__(self, "alpha_code", alpha_code)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __repr__(self) -> str:
+        return (f"CurrencyRecord(currency_id={self.currency_id!r}, aliasable_id={self.aliasable_id!r}, "
+                f"name={self.name!r}, symbol={self.symbol!r}, alpha_code={self.alpha_code!r})")
+
+
+class CurrencyRegistry:
+    """
+    Immutable in-memory index of the `currency` table.
+    Currencies are static reference data, so the registry is built once at startup.
+    """
+
+    __slots__ = ("_currencies", "_by_id", "_by_alpha_code", "_by_aliasable_id")
+
+    def __init__(self, currencies: Iterable[CurrencyRecord]):
+        self._currencies: Tuple[CurrencyRecord, ...] = tuple(sorted(currencies, key=lambda c: c.currency_id))
+        self._by_id = MappingProxyType({c.currency_id: c for c in self._currencies})
+        self._by_alpha_code = MappingProxyType({c.alpha_code.casefold(): c for c in self._currencies})
+        self._by_aliasable_id = MappingProxyType({c.aliasable_id: c for c in self._currencies})
+
+    def __len__(self) -> int:
+        return len(self._currencies)
+
+    def __iter__(self) -> Iterator[CurrencyRecord]:
+        return iter(self._currencies)
+
+    def all(self) -> Tuple[CurrencyRecord, ...]:
+        return self._currencies
+
+    def get(self, currency_id: Optional[int]) -> Optional[CurrencyRecord]:
+        return self._by_id.get(currency_id)
+
+    def by_alpha_code(self, alpha_code: str) -> Optional[CurrencyRecord]:
+        return self._by_alpha_code.get(alpha_code.casefold())
+
+    def by_aliasable_id(self, aliasable_id: int) -> Optional[CurrencyRecord]:
+        return self._by_aliasable_id.get(aliasable_id)
+
+
+_registry: Optional[CurrencyRegistry] = None
+
+
+async def build_currency_registry(session: AsyncSession) -> CurrencyRegistry:
+    r = await session.execute(
+        select(
+            Currency.currency_id,
+            Currency.aliasable_id,
+            Currency.name,
+            Currency.symbol,
+            Currency.alpha_code
+        )
+    )
+    return CurrencyRegistry(CurrencyRecord(*row) for row in r.all())
+
+
+async def load_currency_registry(session_pool: async_sessionmaker[AsyncSession]) -> CurrencyRegistry:
+    """Builds the process-wide currency registry. Meant to be called once, after `init_database`."""
+    global _registry
+    async with session_pool() as session:
+        _registry = await build_currency_registry(session)
+    logger.info(f"Loaded {len(_registry)} currencies into the registry.")
+    return _registry
+
+
+def get_currency_registry() -> CurrencyRegistry:
+    if _registry is None:
+        raise RuntimeError("Currency registry is not loaded. Call `load_currency_registry` on startup.")
+    return _registry
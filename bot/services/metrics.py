@@ -0,0 +1,130 @@
+"""
+Prometheus metrics (`prometheus_client`) for handlers, SQL statements, FSM storage and the DB pool,
+served on `/metrics` by `start_metrics_server`.
+"""
+import logging
+import time
+from typing import Callable, Dict, Iterator, Optional, Any
+
+from aiogram.fsm.storage.base import StorageKey, StateType
+from aiogram.fsm.storage.redis import RedisStorage
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds",
+    "Time spent in update handlers, including inner middlewares.",
+    labelnames=("handler", "status")
+)
+DB_STATEMENT_DURATION = Histogram(
+    "bot_db_statement_duration_seconds",
+    "Execution time of SQL statements by statement type.",
+    labelnames=("statement",)
+)
+FSM_STORAGE_DURATION = Histogram(
+    "bot_fsm_storage_duration_seconds",
+    "Time spent in FSM storage (Redis) operations.",
+    labelnames=("operation",)
+)
+
+
+class PoolCollector(Collector):
+    """DB pool connections by state and checkout totals, read from the pool of `engine` at scrape time."""
+
+    def __init__(self):
+        self.engine: Optional[AsyncEngine] = None
+
+    def collect(self) -> Iterator[Metric]:
+        if self.engine is None:
+            return
+        pool = self.engine.pool  # looked up every time, as the pool is replaced on `dispose`
+        connections = GaugeMetricFamily("bot_db_pool_connections", "DB pool connections by state.", labels=("state",))
+        connections.add_metric(("checked_out",), pool.checkedout())
+        connections.add_metric(("idle",), pool.checkedin())
+        connections.add_metric(("overflow",), pool.overflow())
+        connections.add_metric(("size",), pool.size())
+        yield connections
+
+        stats = getattr(pool, "checkout_stats", None)
+        if stats is None:
+            return
+        checkouts = CounterMetricFamily(
+            "bot_db_pool_checkouts",
+            "DB pool checkouts since startup, by speed.",
+            labels=("speed",)
+        )
+        checkouts.add_metric(("normal",), stats.count - stats.slow_count)
+        checkouts.add_metric(("slow",), stats.slow_count)
+        yield checkouts
+        yield CounterMetricFamily(
+            "bot_db_pool_checkout_wait_seconds",
+            "Time spent waiting for DB pool connections since startup.",
+            value=stats.total_wait
+        )
+
+
+POOL_COLLECTOR = PoolCollector()
+REGISTRY.register(POOL_COLLECTOR)
+
+
+def handler_name(callback: Callable) -> str:
+    """`bot.handlers.storage.storage_multicurrency` -> `storage.storage_multicurrency`"""
+    return f"{callback.__module__.rsplit('.', 1)[-1]}.{callback.__name__}"
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Collects SQL statement timings and pool gauges of `engine`."""
+    sync_engine = engine.sync_engine
+
+    # the start time is kept on the execution context rather than the (pooled) connection,
+    # so nothing is left behind when a statement fails and `after_cursor_execute` never runs
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        statement_type = statement.lstrip().split(None, 1)[0].upper()
+        DB_STATEMENT_DURATION.labels(statement_type).observe(time.perf_counter() - context._query_started_at)
+
+    POOL_COLLECTOR.engine = engine
+
+
+class TimedRedisStorage(RedisStorage):
+    """`RedisStorage` reporting operation timings to `FSM_STORAGE_DURATION`."""
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        with FSM_STORAGE_DURATION.labels("set_state").time():
+            await super().set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with FSM_STORAGE_DURATION.labels("get_state").time():
+            return await super().get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        with FSM_STORAGE_DURATION.labels("set_data").time():
+            await super().set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        with FSM_STORAGE_DURATION.labels("get_data").time():
+            return await super().get_data(key)
+
+
+async def start_metrics_server(host: str, port: int, registry: CollectorRegistry = REGISTRY) -> web.AppRunner:
+    """Serves `registry` from the bot's event loop (`prometheus_client.start_http_server` would need a thread)."""
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(body=generate_latest(registry), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    logger.info(f"Serving metrics on {host}:{port}/metrics")
+    return runner
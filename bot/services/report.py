@@ -0,0 +1,106 @@
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import NamedTuple, Optional, List, Iterable, Tuple
+
+from redis.asyncio import Redis
+
+from bot.money import Money
+
+logger = logging.getLogger(__name__)
+
+
+class ReportRow(NamedTuple):
+    category_id: int
+    currency_id: int
+    total: Money
+    count: int
+
+
+def month_of(timestamp: datetime) -> date:
+    """
+    Returns the first day of the (UTC) month `timestamp` falls into.
+    Naive timestamps are treated as local time, the same way they are stored in `timestamptz` columns.
+    """
+    timestamp = timestamp.astimezone(timezone.utc)
+    return date(timestamp.year, timestamp.month, 1)
+
+
+def is_closed_month(month: date, now: Optional[datetime] = None) -> bool:
+    """A month is closed once the current UTC month is past it."""
+    return month < month_of(now or datetime.now(tz=timezone.utc))
+
+
+class ReportCache:
+    """
+    Redis cache of `monthly_rollup` rows of closed months, keyed by (user_id, month).
+    Closed months only change on recurrent catch-up or a rollup rebuild. Those bump the version of the affected
+    entries (or the epoch of all of them), and an entry is only served if it was computed under the current version,
+    so a reader that loaded rows before an invalidation can't put them back afterwards.
+    Entries expire after `ttl` as a backstop.
+    """
+
+    _epoch_key = "report_epoch"
+
+    def __init__(self, redis: Redis, ttl: int = 7 * 24 * 60 * 60):
+        self.redis = redis
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(user_id: int, month: date) -> str:
+        return f"report:{user_id}:{month:%Y-%m}"
+
+    @staticmethod
+    def _version_key(user_id: int, month: date) -> str:
+        return f"report_version:{user_id}:{month:%Y-%m}"
+
+    async def get(self, user_id: int, month: date) -> Tuple[Optional[List[ReportRow]], str]:
+        """
+        Returns a tuple of:
+            - cached rows if they are up-to-date, None otherwise;
+            - current version of the entry (to be passed to `put` along with rows loaded from the database).
+        """
+        raw_epoch, raw_version, raw = await self.redis.mget(
+            self._epoch_key, self._version_key(user_id, month), self._key(user_id, month)
+        )
+        version = f"{int(raw_epoch or 0)}.{int(raw_version or 0)}"
+        if raw is None:
+            return None, version
+        entry = json.loads(raw)
+        if not isinstance(entry, dict) or entry["version"] != version:  # stale, or cached before versioning
+            return None, version
+        return [
+            ReportRow(category_id, currency_id, Money.from_str(total), count)
+            for category_id, currency_id, total, count in entry["rows"]
+        ], version
+
+    async def put(self, user_id: int, month: date, rows: List[ReportRow], version: str) -> None:
+        """`version` must be the one returned by `get` before the rows were loaded."""
+        await self.redis.set(
+            self._key(user_id, month),
+            json.dumps({
+                "version": version,
+                "rows": [(r.category_id, r.currency_id, str(r.total), r.count) for r in rows]
+            }),
+            ex=self.ttl
+        )
+
+    async def invalidate(self, user_months: Iterable[Tuple[int, date]]) -> None:
+        """Must be called after the changes are committed."""
+        user_months = list(user_months)
+        if not user_months:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, month in user_months:
+                pipe.incr(self._version_key(user_id, month))
+                pipe.expire(self._version_key(user_id, month), self.ttl)
+                pipe.delete(self._key(user_id, month))
+            await pipe.execute()
+        logger.debug(f"Invalidated cached reports {user_months}")
+
+    async def invalidate_all(self) -> None:
+        await self.redis.incr(self._epoch_key)
+        keys = [key async for key in self.redis.scan_iter(match="report:*", count=1000)]
+        if keys:
+            await self.redis.delete(*keys)
+        logger.info(f"Invalidated {len(keys)} cached reports")
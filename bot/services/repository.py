@@ -1,10 +1,14 @@
-from datetime import datetime
-from typing import Optional, Type, List, Dict, Sequence
+import logging
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional, Type, List, Dict, Sequence, Set, Tuple, Iterable, NamedTuple
 
-from sqlalchemy import select, func, delete, update, union
+from sqlalchemy import select, func, delete, update, union, tuple_, literal_column, text, values, column
+from sqlalchemy.dialects.postgresql import JSON, DATE, aggregate_order_by, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot.db.types import RecurrentPeriodUnit
+from bot.money import Money
 from bot.db.model_types import NumberedModel, AliasableModel, ModelWithDefault
 from bot.db.models import (
     User,
@@ -14,19 +18,86 @@ from bot.db.models import (
     Storage,
     StorageCredit,
     StorageCurrency,
+    StorageBalance,
     Alias,
     Currency,
     UserDefault,
     Transaction,
+    MonthlyRollup,
     Recurrent
 )
+from bot.services.currency_registry import CurrencyRecord, get_currency_registry
+from bot.services.report import ReportCache, ReportRow, month_of, is_closed_month
+from bot.services.user_cache import UserCache
+from bot.services.snapshot import (
+    SnapshotCache,
+    ResolutionSnapshot,
+    UserContext,
+    StorageRecord,
+    CategoryRecord,
+    AliasRecord
+)
 from bot.utils.recurrent import recurrent_timestamps
 from bot.utils.transaction import split_transaction
 
+logger = logging.getLogger(__name__)
+
+# first key of `pg_advisory_xact_lock(key, user_id)`, serializing balance changes of a user across processes
+BALANCE_LOCK_KEY = 1
+
+
+class NewTransaction(NamedTuple):
+    """Transaction to be added, before splitting into monthly installments."""
+    storage_id: int
+    category_id: int
+    currency_id: int
+    amount_total: Money
+    months: int
+
 
 class Repository:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+            self,
+            session: AsyncSession,
+            snapshot_cache: Optional[SnapshotCache] = None,
+            report_cache: Optional[ReportCache] = None,
+            user_cache: Optional[UserCache] = None
+    ):
         self.session = session
+        self.snapshot_cache = snapshot_cache
+        self.report_cache = report_cache
+        self.user_cache = user_cache
+        self._stale_snapshot_user_ids: Set[int] = set()
+        self._stale_telegram_ids: Set[int] = set()
+        self._stale_report_months: Set[Tuple[int, date]] = set()
+        self._stale_all_reports = False
+
+    def _invalidate_snapshot(self, user_id: int) -> None:
+        """Marks user's resolution snapshot as stale. Invalidation is published by `publish_invalidations`."""
+        self._stale_snapshot_user_ids.add(user_id)
+
+    async def publish_invalidations(self) -> None:
+        """Publishes cache invalidations collected so far. Must be called after the session is committed."""
+        if self.snapshot_cache is not None and self._stale_snapshot_user_ids:
+            await self.snapshot_cache.invalidate(self._stale_snapshot_user_ids)
+        if self.user_cache is not None:
+            self.user_cache.invalidate(self._stale_telegram_ids)
+        if self.report_cache is not None:
+            if self._stale_all_reports:
+                await self.report_cache.invalidate_all()
+            elif self._stale_report_months:
+                await self.report_cache.invalidate(self._stale_report_months)
+        self._stale_snapshot_user_ids.clear()
+        self._stale_telegram_ids.clear()
+        self._stale_report_months.clear()
+        self._stale_all_reports = False
+
+    async def _lock_user_balances(self, user_id: int) -> None:
+        """
+        Takes a per-user advisory lock until the end of the transaction. Held by code changing user's balances
+        outside of the dispatcher, whose event isolation doesn't cover it: `RecurrentScheduler` and rebuilds.
+        """
+        await self.session.execute(select(func.pg_advisory_xact_lock(BALANCE_LOCK_KEY, user_id)))
 
     async def _get_max_model_target_for_user(self, user_id: int, colname_target: str, model: Type[NumberedModel]):
         column_target = getattr(model, colname_target)
@@ -91,20 +162,31 @@ class Repository:
         return r.scalars().all()
 
     async def _get_aliasable_id_by_currency_id(self, currency_id: int) -> Optional[int]:
-        r = await self.session.execute(
-            select(Currency.aliasable_id)
-            .where(Currency.currency_id == currency_id)
-        )
-        currency_id = r.scalar()
-        return currency_id
+        currency = get_currency_registry().get(currency_id)
+        return currency.aliasable_id if currency else None
 
     async def _refresh_model_numbers_for_user(self, user_id: int, model: Type[NumberedModel]) -> None:
         if not hasattr(model, "number"):
             raise ValueError(f"Model {model.__class__} does not define a column named 'number'")
-        model_instances = await self._get_models_for_user(user_id, model=model)
-        for n, model_instance in enumerate(model_instances):
-            model_instance.number = n + 1
-            await self.session.merge(model_instance)
+        self._invalidate_snapshot(user_id)
+        primary_key = model.__mapper__.primary_key[0]
+        renumbered = (
+            select(
+                primary_key.label("id"),
+                func.row_number().over(order_by=model.number).label("number")
+            )
+            .where(model.user_id == user_id)
+            .subquery()
+        )
+        await self.session.execute(
+            update(model)
+            .where(
+                primary_key == renumbered.c.id,
+                model.number != renumbered.c.number
+            )
+            .values(number=renumbered.c.number)
+            .execution_options(synchronize_session="fetch")
+        )
 
     async def _add_aliasable(self, aliasable_subtype: AliasableSubtype) -> Aliasable:
         aliasable = Aliasable(aliasable_subtype=aliasable_subtype)
@@ -143,6 +225,7 @@ class Repository:
             model: Type[ModelWithDefault],
             id_: int | None
     ) -> UserDefault:
+        self._invalidate_snapshot(user_id)
         model_id_column = model.__tablename__ + "_id"
         user_default = await self.get_user_default(user_id)
         if user_default is None:
@@ -150,13 +233,31 @@ class Repository:
         setattr(user_default, model_id_column, id_)
         return await self.session.merge(user_default)
 
-    async def add_user(self, telegram_id: int, first_name: str, banned: bool) -> User:
-        user = User(
-            telegram_id=telegram_id,
-            first_name=first_name,
-            banned=banned
+    async def add_user(self, telegram_id: int, first_name: str, banned: bool) -> Optional[User]:
+        """Returns None if a user with this telegram_id already exists (e.g. was added concurrently)."""
+        self._stale_telegram_ids.add(telegram_id)  # not to be cached before commit
+        r = await self.session.execute(
+            insert(User)
+            .values(telegram_id=telegram_id, first_name=first_name, banned=banned)
+            .on_conflict_do_nothing(index_elements=[User.telegram_id])
+            .returning(User)
         )
-        return await self.session.merge(user)
+        return r.scalar_one_or_none()
+
+    async def set_user_banned(self, telegram_id: int, banned: bool) -> Optional[int]:
+        """Returns user_id of the updated user, None if there is no user with this telegram_id."""
+        self._stale_telegram_ids.add(telegram_id)
+        user_id = await self.session.scalar(
+            update(User)
+            .where(User.telegram_id == telegram_id)
+            .values(banned=banned)
+            .returning(User.user_id)
+        )
+        if user_id is not None:
+            # cached users are only served along with an up-to-date snapshot (see `load_user_context`),
+            # so bumping the shared snapshot version makes every process reload the user
+            self._invalidate_snapshot(user_id)
+        return user_id
 
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         r = await self.session.execute(
@@ -167,6 +268,7 @@ class Repository:
         return user
 
     async def add_category(self, user_id: int, name: str, factor_in: bool) -> Category:
+        self._invalidate_snapshot(user_id)
         aliasable = await self._add_aliasable(aliasable_subtype="category")
 
         number = await self.get_max_category_number_for_user(user_id) + 1
@@ -194,6 +296,14 @@ class Repository:
         return await self._get_max_model_number_for_user(user_id, model=Category)
 
     async def update_category_by_number_for_user(self, user_id: int, number: int, name: str, factor_in: bool) -> None:
+        self._invalidate_snapshot(user_id)
+        factor_in_before = await self.session.scalar(
+            select(Category.factor_in)
+            .where(
+                Category.user_id == user_id,
+                Category.number == number
+            )
+        )
         await self.session.execute(
             update(Category)
             .where(
@@ -202,12 +312,16 @@ class Repository:
             )
             .values({"name": name, "factor_in": factor_in})
         )
+        # `factor_in` decides which transactions count towards balances
+        if factor_in_before is not None and factor_in_before != factor_in:
+            await self.rebuild_storage_balances(user_id=user_id)
 
     async def refresh_category_numbers_for_user(self, user_id: int) -> None:
         await self._refresh_model_numbers_for_user(user_id, model=Category)
 
     async def delete_category_by_number_for_user(self, user_id: int, number: int) -> None:
         # todo: what to do with Transaction table?
+        self._invalidate_snapshot(user_id)
         category = await self.get_category_by_number_for_user(user_id, number)
         if await self._model_is_default_for_user(user_id, model=Category, id_=category.category_id):
             await self._upsert_user_default_model(user_id, model=Category, id_=None)
@@ -247,6 +361,7 @@ class Repository:
             if currency_id is None:
                 raise ValueError("`currency_id` not provided for Storage with multicurrency=False")
 
+        self._invalidate_snapshot(user_id)
         aliasable = await self._add_aliasable(aliasable_subtype="storage")
 
         number = await self.get_max_storage_number_for_user(user_id) + 1
@@ -288,6 +403,7 @@ class Repository:
         return await self._get_max_model_number_for_user(user_id, model=Storage)
 
     async def update_storage_by_number_for_user(self, user_id: int, number: int, name: str) -> None:
+        self._invalidate_snapshot(user_id)
         await self.session.execute(
             update(Storage)
             .where(
@@ -302,9 +418,14 @@ class Repository:
 
     async def delete_storage_by_number_for_user(self, user_id: int, number: int) -> None:
         # todo: what to do with Transaction table?
+        self._invalidate_snapshot(user_id)
         storage = await self.get_storage_by_number_for_user(user_id, number)
         if await self._model_is_default_for_user(user_id, model=Storage, id_=storage.storage_id):
             await self._upsert_user_default_model(user_id, model=Storage, id_=None)
+        await self.session.execute(
+            delete(StorageBalance)
+            .where(StorageBalance.storage_id == storage.storage_id)
+        )
         await self._delete_aliasable(storage.aliasable_id)
         await self.session.delete(storage)
         await self.session.flush()
@@ -351,6 +472,7 @@ class Repository:
         if not aliasable_id:
             raise ValueError(f"Aliasable with number {aliasable_number} not found for user with id {user_id}")
 
+        self._invalidate_snapshot(user_id)
         number = await self.get_max_alias_number_for_user(user_id=user_id) + 1
 
         alias = Alias(
@@ -430,9 +552,14 @@ class Repository:
         await self._refresh_model_numbers_for_user(user_id, model=Alias)
 
     async def delete_alias_by_number_for_user(self, user_id: int, number: int) -> None:
-        alias = self.get_alias_by_number_for_user(user_id, number)
-        await self.session.delete(alias)
-        await self.session.flush()
+        self._invalidate_snapshot(user_id)
+        await self.session.execute(
+            delete(Alias)
+            .where(
+                Alias.user_id == user_id,
+                Alias.number == number
+            )
+        )
         await self.refresh_alias_numbers_for_user(user_id)
 
     async def get_user_default(self, user_id: int) -> Optional[UserDefault]:
@@ -443,37 +570,148 @@ class Repository:
         user_default = r.scalar()
         return user_default
 
-    async def get_currencies(self) -> Sequence[Currency]:
+    @staticmethod
+    def _select_resolution_snapshot():
+        """
+        Selects user's defaults, storages, categories, and aliases in a single statement.
+        Storages, categories, and aliases are aggregated into JSON arrays by correlated subqueries.
+        """
+        storages = (
+            select(func.json_agg(aggregate_order_by(
+                func.json_build_array(*[getattr(Storage, f) for f in StorageRecord._fields]),
+                Storage.number
+            ), type_=JSON))
+            .where(Storage.user_id == User.user_id)
+            .scalar_subquery()
+        )
+        categories = (
+            select(func.json_agg(aggregate_order_by(
+                func.json_build_array(*[getattr(Category, f) for f in CategoryRecord._fields]),
+                Category.number
+            ), type_=JSON))
+            .where(Category.user_id == User.user_id)
+            .scalar_subquery()
+        )
+        aliases = (
+            select(func.json_agg(aggregate_order_by(
+                func.json_build_array(
+                    Alias.alias_id,
+                    Alias.aliasable_id,
+                    Aliasable.aliasable_subtype,
+                    Alias.number,
+                    Alias.name
+                ),
+                Alias.number
+            ), type_=JSON))
+            .join(Aliasable, Alias.aliasable_id == Aliasable.aliasable_id)
+            .where(Alias.user_id == User.user_id)
+            .scalar_subquery()
+        )
+        return (
+            select(
+                User,
+                UserDefault.category_id.label("default_category_id"),
+                UserDefault.storage_id.label("default_storage_id"),
+                UserDefault.currency_id.label("default_currency_id"),
+                storages.label("storages"),
+                categories.label("categories"),
+                aliases.label("aliases")
+            )
+            .outerjoin(UserDefault, UserDefault.user_id == User.user_id)
+        )
+
+    @staticmethod
+    def _resolution_snapshot_from_row(row, version: int) -> ResolutionSnapshot:
+        return ResolutionSnapshot(
+            user_id=row.User.user_id,
+            version=version,
+            default_category_id=row.default_category_id,
+            default_storage_id=row.default_storage_id,
+            default_currency_id=row.default_currency_id,
+            storages=[StorageRecord(*s) for s in row.storages or ()],
+            categories=[CategoryRecord(*c) for c in row.categories or ()],
+            aliases=[AliasRecord(*a) for a in row.aliases or ()]
+        )
+
+    async def load_resolution_snapshot(self, user_id: int, version: int = 0) -> ResolutionSnapshot:
         r = await self.session.execute(
-            select(Currency)
-            .order_by(Currency.currency_id)
+            self._select_resolution_snapshot()
+            .where(User.user_id == user_id)
+        )
+        return self._resolution_snapshot_from_row(r.one(), version=version)
+
+    async def get_resolution_snapshot(self, user_id: int) -> ResolutionSnapshot:
+        """
+        Returns user's resolution snapshot from the cache, loading (and caching) it on a miss.
+        Snapshots of users with uncommitted changes in this session are never cached.
+        """
+        if self.snapshot_cache is None:
+            return await self.load_resolution_snapshot(user_id)
+        if user_id in self._stale_snapshot_user_ids:
+            return await self.load_resolution_snapshot(user_id)
+        snapshot, version = await self.snapshot_cache.get(user_id)
+        if snapshot is None:
+            snapshot = await self.load_resolution_snapshot(user_id, version=version)
+            await self.snapshot_cache.put(snapshot)
+        return snapshot
+
+    async def load_user_context(self, telegram_id: int) -> Optional[UserContext]:
+        """
+        Loads the user along with their resolution snapshot. If both the user and an up-to-date snapshot
+        are cached, the database isn't queried at all; otherwise it takes a single round trip to load the user row
+        together with their defaults, storages, categories, and aliases.
+        Returns None if the user does not exist.
+        """
+        version = None
+        cached_user = (
+            self.user_cache.get(telegram_id)
+            if self.user_cache is not None and telegram_id not in self._stale_telegram_ids
+            else None
         )
-        currencies = r.scalars().all()
-        return currencies
+        if cached_user is not None and self.snapshot_cache is not None \
+                and cached_user.user_id not in self._stale_snapshot_user_ids:
+            snapshot, version = await self.snapshot_cache.get(cached_user.user_id)
+            if snapshot is not None:
+                user = User(user_id=cached_user.user_id, telegram_id=telegram_id, banned=cached_user.banned)
+                return UserContext(user, snapshot)
 
-    async def get_currency_by_alpha_code(self, alpha_code: str) -> Optional[Currency]:
         r = await self.session.execute(
-            select(Currency)
-            .where(Currency.alpha_code == alpha_code)
+            self._select_resolution_snapshot()
+            .where(User.telegram_id == telegram_id)
         )
-        currency = r.scalar()
-        return currency
+        row = r.one_or_none()
+        if row is None:
+            return None
+        snapshot = self._resolution_snapshot_from_row(row, version=version or 0)
 
-    async def get_currency_by_aliasable_id(self, aliasable_id: int) -> Optional[Currency]:
-        return await self._get_model_by_aliasable_id(aliasable_id=aliasable_id, model=Currency)
+        if self.user_cache is not None and telegram_id not in self._stale_telegram_ids:
+            self.user_cache.put(telegram_id, row.User.user_id, row.User.banned)
+        # snapshot can only be cached if its version was read before the snapshot itself
+        if self.snapshot_cache is not None and version is not None:
+            await self.snapshot_cache.put(snapshot)
 
-    async def set_default_currency(self, user_id: int, alpha_code: str) -> Currency:
+        return UserContext(row.User, snapshot)
+
+    async def get_currencies(self) -> Sequence[CurrencyRecord]:
+        return get_currency_registry().all()
+
+    async def get_currency_by_alpha_code(self, alpha_code: str) -> Optional[CurrencyRecord]:
+        return get_currency_registry().by_alpha_code(alpha_code)
+
+    async def get_currency_by_aliasable_id(self, aliasable_id: int) -> Optional[CurrencyRecord]:
+        return get_currency_registry().by_aliasable_id(aliasable_id)
+
+    async def set_default_currency(self, user_id: int, alpha_code: str) -> CurrencyRecord:
         currency = await self.get_currency_by_alpha_code(alpha_code)
         if not currency:
             raise ValueError(f"Currency with alpha code {alpha_code} not found")
         await self._upsert_user_default_model(user_id, model=Currency, id_=currency.currency_id)
         return currency
 
-    async def get_default_currency_for_user(self, user_id: int) -> Optional[Currency]:
+    async def get_default_currency_for_user(self, user_id: int) -> Optional[CurrencyRecord]:
         user_default = await self.get_user_default(user_id)
         if user_default.currency_id:
-            currency = self.session.get(Currency, user_default.currency_id)
-            return await currency
+            return get_currency_registry().get(user_default.currency_id)
         else:
             return None
 
@@ -483,25 +721,258 @@ class Repository:
             storage_id: int,
             category_id: int,
             currency_id: int,
-            amount_total: float,
-            months: int
-    ) -> None:
+            amount_total: Money,
+            months: int,
+            return_ids: bool = False
+    ) -> Optional[List[int]]:
+        """Adds a transaction, split into `months` monthly installments. With `return_ids` returns their ids."""
+        return await self.add_transaction_batch(
+            user_id,
+            [NewTransaction(storage_id, category_id, currency_id, amount_total, months)],
+            return_ids=return_ids
+        )
+
+    async def add_transaction_batch(
+            self,
+            user_id: int,
+            transactions: Iterable[NewTransaction],
+            return_ids: bool = False
+    ) -> Optional[List[int]]:
+        """
+        Adds several transactions (each split into its monthly installments) with a single multi-row INSERT,
+        and updates balances and monthly totals with one statement each.
+        With `return_ids` returns ids of all inserted rows, installments of each transaction in order.
+        """
+        rows = []
+        for transaction in transactions:
+            timestamps, amounts = await split_transaction(transaction.amount_total, transaction.months)
+            rows.extend(
+                {
+                    "user_id": user_id,
+                    "storage_id": transaction.storage_id,
+                    "category_id": transaction.category_id,
+                    "currency_id": transaction.currency_id,
+                    "timestamp": timestamp,
+                    "amount": amount
+                }
+                for timestamp, amount in zip(timestamps, amounts)
+            )
+
+        transaction_ids = await self._insert_transactions(rows, return_ids=return_ids)
+        await self._add_to_storage_balances(rows)
+        await self._add_to_monthly_rollups(rows)
+        return transaction_ids
+
+    async def _insert_transactions(self, rows: List[Dict], return_ids: bool = False) -> Optional[List[int]]:
+        """
+        Inserts transactions with a single multi-row INSERT, bypassing the unit of work and the identity map.
+        Ids are only fetched (in the order of `rows`) if `return_ids` is set.
+        """
+        if not rows:
+            return [] if return_ids else None
+        if not return_ids:
+            await self.session.execute(insert(Transaction), rows)
+            return None
+        r = await self.session.execute(
+            insert(Transaction).returning(Transaction.transaction_id, sort_by_parameter_order=True),
+            rows
+        )
+        return list(r.scalars().all())
+
+    async def _add_to_storage_balances(self, rows: Iterable[Dict]) -> None:
+        """
+        Adds amounts of transaction `rows` to the balances of their storages in their currencies,
+        skipping categories excluded from balance calculations.
+        """
+        totals: Dict[Tuple[int, int, int], int] = defaultdict(int)  # cents
+        for row in rows:
+            totals[row["storage_id"], row["category_id"], row["currency_id"]] += row["amount"].cents
+        if not totals:
+            return
+
+        amounts = values(
+            column("storage_id", StorageBalance.storage_id.type),
+            column("category_id", Category.category_id.type),
+            column("currency_id", StorageBalance.currency_id.type),
+            column("amount", StorageBalance.amount.type),
+            name="amounts"
+        ).data([(*key, Money(cents)) for key, cents in totals.items()])
+        stmt = insert(StorageBalance).from_select(
+            ["storage_id", "currency_id", "amount"],
+            select(amounts.c.storage_id, amounts.c.currency_id, func.sum(amounts.c.amount))
+            .join(Category, Category.category_id == amounts.c.category_id)
+            .where(Category.factor_in)
+            .group_by(amounts.c.storage_id, amounts.c.currency_id)
+        )
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[StorageBalance.storage_id, StorageBalance.currency_id],
+                set_={"amount": StorageBalance.amount + stmt.excluded.amount}
+            )
+        )
 
-        timestamps, amounts = await split_transaction(amount_total, months)
+    async def rebuild_storage_balances(self, user_id: Optional[int] = None) -> None:
+        """
+        Recomputes storage balances from raw transactions: for all users, or for the given user only.
+        A full rebuild locks the table, so that concurrent transaction inserts wait until it is committed.
+        A rebuild for a single user takes the user's balance lock, also taken by `RecurrentScheduler`
+        (updates from handlers are serialized by the dispatcher's event isolation).
+        """
+        if user_id is None:
+            await self.session.execute(text("LOCK TABLE storage_balance IN SHARE ROW EXCLUSIVE MODE"))
+        else:
+            await self._lock_user_balances(user_id)
 
-        transactions = [
-            Transaction(
-                user_id=user_id,
-                storage_id=storage_id,
-                category_id=category_id,
-                currency_id=currency_id,
-                timestamp=timestamp,
-                amount=amount
+        stmt_delete = delete(StorageBalance)
+        stmt_totals = (
+            select(Transaction.storage_id, Transaction.currency_id, func.sum(Transaction.amount))
+            .join(Category, Transaction.category_id == Category.category_id)
+            .where(Category.factor_in)
+            .group_by(Transaction.storage_id, Transaction.currency_id)
+        )
+        if user_id is not None:
+            stmt_delete = stmt_delete.where(
+                StorageBalance.storage_id.in_(select(Storage.storage_id).where(Storage.user_id == user_id))
             )
-            for timestamp, amount in zip(timestamps, amounts)
-        ]
+            stmt_totals = stmt_totals.where(Transaction.user_id == user_id)
 
-        self.session.add_all(transactions)
+        await self.session.execute(stmt_delete)
+        stmt = insert(StorageBalance).from_select(["storage_id", "currency_id", "amount"], stmt_totals)
+        await self.session.execute(
+            # a balance row may still be added concurrently by a writer not holding the lock, totals win then
+            stmt.on_conflict_do_update(
+                index_elements=[StorageBalance.storage_id, StorageBalance.currency_id],
+                set_={"amount": stmt.excluded.amount}
+            )
+        )
+
+    async def _add_to_monthly_rollups(self, rows: Iterable[Dict]) -> None:
+        """Adds transaction `rows` to the monthly totals, bucketing each one by the month of its own timestamp."""
+        totals: Dict[Tuple[int, date, int, int], int] = defaultdict(int)  # cents
+        counts: Dict[Tuple[int, date, int, int], int] = defaultdict(int)
+        for row in rows:
+            key = (row["user_id"], month_of(row["timestamp"]), row["category_id"], row["currency_id"])
+            totals[key] += row["amount"].cents
+            counts[key] += 1
+        if not totals:
+            return
+
+        stmt = insert(MonthlyRollup).values([
+            {
+                "user_id": user_id,
+                "month": month,
+                "category_id": category_id,
+                "currency_id": currency_id,
+                "total": Money(cents),
+                "count": counts[user_id, month, category_id, currency_id]
+            }
+            for (user_id, month, category_id, currency_id), cents in totals.items()
+        ])
+        await self.session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[
+                    MonthlyRollup.user_id,
+                    MonthlyRollup.month,
+                    MonthlyRollup.category_id,
+                    MonthlyRollup.currency_id
+                ],
+                set_={
+                    "total": MonthlyRollup.total + stmt.excluded.total,
+                    "count": MonthlyRollup.count + stmt.excluded.count
+                }
+            )
+        )
+        self._stale_report_months.update(
+            (user_id, month) for user_id, month, _, _ in totals if is_closed_month(month)
+        )
+
+    async def rebuild_monthly_rollups(self, user_id: Optional[int] = None) -> None:
+        """Recomputes monthly totals from raw transactions: for all users, or for the given user only."""
+        if user_id is None:
+            await self.session.execute(text("LOCK TABLE monthly_rollup IN SHARE ROW EXCLUSIVE MODE"))
+
+        # literal arguments, so that the expression is rendered identically in SELECT and GROUP BY
+        month = func.date_trunc(
+            literal_column("'month'"),
+            func.timezone(literal_column("'UTC'"), Transaction.timestamp)
+        ).cast(DATE)
+        stmt_delete = delete(MonthlyRollup)
+        stmt_totals = (
+            select(
+                Transaction.user_id,
+                month,
+                Transaction.category_id,
+                Transaction.currency_id,
+                func.sum(Transaction.amount),
+                func.count()
+            )
+            .group_by(Transaction.user_id, month, Transaction.category_id, Transaction.currency_id)
+        )
+        if user_id is not None:
+            stmt_delete = stmt_delete.where(MonthlyRollup.user_id == user_id)
+            stmt_totals = stmt_totals.where(Transaction.user_id == user_id)
+
+        await self.session.execute(stmt_delete)
+        await self.session.execute(
+            insert(MonthlyRollup)
+            .from_select(["user_id", "month", "category_id", "currency_id", "total", "count"], stmt_totals)
+        )
+        self._stale_all_reports = True
+
+    async def get_monthly_rollup_for_user(self, user_id: int, month: date) -> List[ReportRow]:
+        """Returns user's totals for the month. Totals of closed months are served from `report_cache` if possible."""
+        cacheable = (
+            self.report_cache is not None
+            and is_closed_month(month)
+            and (user_id, month) not in self._stale_report_months
+            and not self._stale_all_reports
+        )
+        if cacheable:
+            rows, version = await self.report_cache.get(user_id, month)
+            if rows is not None:
+                return rows
+
+        r = await self.session.execute(
+            select(
+                MonthlyRollup.category_id,
+                MonthlyRollup.currency_id,
+                MonthlyRollup.total,
+                MonthlyRollup.count
+            )
+            .where(
+                MonthlyRollup.user_id == user_id,
+                MonthlyRollup.month == month,
+                MonthlyRollup.count > 0
+            )
+            .order_by(MonthlyRollup.category_id, MonthlyRollup.currency_id)
+        )
+        rows = [ReportRow(*row) for row in r.all()]
+        if cacheable:
+            await self.report_cache.put(user_id, month, rows, version)
+        return rows
+
+    async def get_storage_balances_for_user(self, user_id: int) -> List[Dict]:
+        """
+        Returns a list of non-empty storage balances for user with user_id in the following format:
+        {"storage_number": v, "storage_name": w, "amount": x, "currency_symbol": y, "currency_alpha_code": z}
+        """
+        r = await self.session.execute(
+            select(
+                Storage.number.label("storage_number"),
+                Storage.name.label("storage_name"),
+                StorageBalance.amount,
+                Currency.symbol.label("currency_symbol"),
+                Currency.alpha_code.label("currency_alpha_code")
+            )
+            .join(Storage, StorageBalance.storage_id == Storage.storage_id)
+            .join(Currency, StorageBalance.currency_id == Currency.currency_id)
+            .where(
+                Storage.user_id == user_id,
+                StorageBalance.amount != Money(0)
+            )
+            .order_by(Storage.number, Currency.alpha_code)
+        )
+        return [row._asdict() for row in r.all()]
 
     async def get_transactions_for_user(self, user_id: int) -> Sequence[Transaction]:
         r = await self.session.execute(
@@ -510,20 +981,47 @@ class Repository:
         )
         return r.scalars().all()
 
-    async def get_transactions_with_names_for_user(self, user_id: int) -> List[Dict]:
+    async def get_transaction_page_with_names_for_user(
+            self,
+            user_id: int,
+            limit: int,
+            before: Optional[Tuple[datetime, int]] = None,
+            after: Optional[Tuple[datetime, int]] = None
+    ) -> List[Dict]:
+        """
+        Returns up to `limit` transactions for user with user_id, newest first, in the following format:
+        {"transaction_id": u, "timestamp": v, "amount": w, "category_name": x, "storage_name": y, "currency_symbol": z}
+        `before` and `after` are (timestamp, transaction_id) keyset cursors: only transactions older than `before`
+        or newer than `after` are returned.
+        """
 
-        r = await self.session.execute(
+        keyset = tuple_(Transaction.timestamp, Transaction.transaction_id)
+        stmt = (
             select(
-                Transaction,
+                Transaction.transaction_id,
+                Transaction.timestamp,
+                Transaction.amount,
                 Category.name.label("category_name"),
                 Storage.name.label("storage_name"),
-                Currency.symbol.label("currency_symbol"),
-                Currency.alpha_code.label("currency_alpha_code")
+                Currency.symbol.label("currency_symbol")
             )
             .join(Category, Transaction.category_id == Category.category_id)
             .join(Storage, Transaction.storage_id == Storage.storage_id)
             .join(Currency, Transaction.currency_id == Currency.currency_id)
             .where(Transaction.user_id == user_id)
+            .limit(limit)
+        )
+        if after is not None:
+            r = await self.session.execute(
+                stmt
+                .where(keyset > tuple_(*after))
+                .order_by(Transaction.timestamp, Transaction.transaction_id)
+            )
+            return [row._asdict() for row in reversed(r.all())]
+        if before is not None:
+            stmt = stmt.where(keyset < tuple_(*before))
+        r = await self.session.execute(
+            stmt.order_by(Transaction.timestamp.desc(), Transaction.transaction_id.desc())
         )
         return [row._asdict() for row in r.all()]
 
@@ -534,12 +1032,14 @@ class Repository:
             category_id: int,
             currency_id: int,
             name: str,
-            amount: float,
+            amount: Money,
             start_timestamp: datetime,
             period: int,
             period_unit: RecurrentPeriodUnit,
             next_timestamp: Optional[datetime] = None
     ) -> None:
+        if period <= 0:
+            raise ValueError("Recurrent transaction period must be positive.")
 
         next_timestamp = next_timestamp or start_timestamp
 
@@ -584,8 +1084,85 @@ class Repository:
         )
         return [row._asdict() for row in r.all()]
 
-    async def get_recurrent_transaction_by_number_for_user(self, user_id: int, number: int) -> Optional[Recurrent]:
-        return await self._get_model_by_number_for_user(user_id, number, model=Recurrent)
+    async def get_recurrent_transaction_by_number_for_user(
+            self,
+            user_id: int,
+            number: int,
+            for_update: bool = False
+    ) -> Optional[Recurrent]:
+        """
+        With `for_update` locks the row (waiting for the scheduler if it has claimed it)
+        and reloads it, so that `next_timestamp` is up-to-date.
+        """
+        if not for_update:
+            return await self._get_model_by_number_for_user(user_id, number, model=Recurrent)
+        r = await self.session.execute(
+            select(Recurrent)
+            .where(
+                Recurrent.user_id == user_id,
+                Recurrent.number == number
+            )
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return r.scalar()
+
+    async def claim_due_recurrent_transactions(
+            self,
+            due_timestamp: datetime,
+            limit: int,
+            exclude_ids: Iterable[int] = ()
+    ) -> Sequence[Recurrent]:
+        """
+        Locks up to `limit` recurrent transactions due by `due_timestamp`, earliest first.
+        Rows already locked by another transaction (e.g. another bot process) are skipped, as are `exclude_ids`.
+        """
+        stmt = (
+            select(Recurrent)
+            .where(Recurrent.next_timestamp <= due_timestamp)
+            .order_by(Recurrent.next_timestamp)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        exclude_ids = list(exclude_ids)
+        if exclude_ids:
+            stmt = stmt.where(Recurrent.recurrent_id.not_in(exclude_ids))
+        r = await self.session.execute(stmt)
+        return r.scalars().all()
+
+    async def renew_due_recurrent_transactions(
+            self,
+            due_timestamp: datetime,
+            limit: int,
+            max_occurrences: Optional[int] = None,
+            failed_ids: Optional[Set[int]] = None
+    ) -> int:
+        """
+        Claims a batch of due recurrent transactions and materializes their occurrences up to `due_timestamp`,
+        at most `max_occurrences` per recurrent transaction (the rest is left for subsequent batches).
+        Each one is renewed in its own savepoint: one that fails is logged, rolled back and added to `failed_ids`,
+        which are not claimed again, so that it doesn't hold up the rest.
+        Returns the number of claimed recurrent transactions.
+        """
+        if failed_ids is None:
+            failed_ids = set()
+        recurrent_transactions = await self.claim_due_recurrent_transactions(due_timestamp, limit, failed_ids)
+        # in the order of user ids, so that concurrent schedulers can't deadlock on them
+        for user_id in sorted({r.user_id for r in recurrent_transactions}):
+            await self._lock_user_balances(user_id)
+        for recurrent_transaction in recurrent_transactions:
+            recurrent_id = recurrent_transaction.recurrent_id
+            try:
+                async with self.session.begin_nested():
+                    await self._renew_recurrent_transaction(
+                        recurrent_transaction,
+                        up_to_timestamp=due_timestamp,
+                        max_occurrences=max_occurrences
+                    )
+            except Exception:
+                logger.exception(f"Failed to renew recurrent transaction {recurrent_id}, skipping it")
+                failed_ids.add(recurrent_id)
+        return len(recurrent_transactions)
 
     async def get_max_recurrent_number_for_user(self, user_id: int) -> int:
         return await self._get_max_model_number_for_user(user_id, model=Recurrent)
@@ -604,9 +1181,9 @@ class Repository:
             user_id: int,
             number: int,
             name: str,
-            amount: float,
+            amount: Money,
     ) -> None:
-        recurrent_transaction = await self.get_recurrent_transaction_by_number_for_user(user_id, number)
+        recurrent_transaction = await self.get_recurrent_transaction_by_number_for_user(user_id, number, for_update=True)
         if not recurrent_transaction:
             raise ValueError("Recurrent transaction not found.")
         await self._renew_recurrent_transaction(recurrent_transaction)
@@ -618,7 +1195,7 @@ class Repository:
         await self._refresh_model_numbers_for_user(user_id, model=Recurrent)
 
     async def delete_recurrent_transaction_by_number_for_user(self, user_id: int, number: int) -> None:
-        recurrent_transaction = await self.get_recurrent_transaction_by_number_for_user(user_id, number)
+        recurrent_transaction = await self.get_recurrent_transaction_by_number_for_user(user_id, number, for_update=True)
         if not recurrent_transaction:
             raise ValueError("Recurrent transaction not found.")
         await self._renew_recurrent_transaction(recurrent_transaction)
@@ -626,28 +1203,38 @@ class Repository:
         await self.session.flush()
         await self.refresh_recurrent_numbers_for_user(user_id)
 
-    async def _renew_recurrent_transaction(self, recurrent_transaction: Recurrent) -> None:
+    async def _renew_recurrent_transaction(
+            self,
+            recurrent_transaction: Recurrent,
+            up_to_timestamp: Optional[datetime] = None,
+            max_occurrences: Optional[int] = None
+    ) -> None:
         timestamps, next_timestamp = recurrent_timestamps(
+            start_timestamp=recurrent_transaction.start_timestamp,
             next_timestamp=recurrent_transaction.next_timestamp,
             period=recurrent_transaction.period,
-            period_unit=recurrent_transaction.period_unit
+            period_unit=recurrent_transaction.period_unit,
+            up_to_timestamp=up_to_timestamp,
+            limit=max_occurrences
         )
 
         if timestamps:
-            transactions = [
-                Transaction(
-                    user_id=recurrent_transaction.user_id,
-                    storage_id=recurrent_transaction.storage_id,
-                    category_id=recurrent_transaction.category_id,
-                    currency_id=recurrent_transaction.currency_id,
-                    timestamp=timestamp,
-                    amount=recurrent_transaction.amount
-                )
-                for timestamp in timestamps
-            ]
             await self.update_recurrent_transaction_next_timestamp(recurrent_transaction.recurrent_id, next_timestamp)
 
-            self.session.add_all(transactions)
+            rows = [
+                {
+                    "user_id": recurrent_transaction.user_id,
+                    "storage_id": recurrent_transaction.storage_id,
+                    "category_id": recurrent_transaction.category_id,
+                    "currency_id": recurrent_transaction.currency_id,
+                    "timestamp": timestamp,
+                    "amount": recurrent_transaction.amount
+                }
+                for timestamp in timestamps
+            ]
+            await self._insert_transactions(rows)
+            await self._add_to_storage_balances(rows)
+            await self._add_to_monthly_rollups(rows)
 
     async def _renew_recurrent_transactions(self, user_id: int) -> None:
         recurrent_transactions = await self.get_recurrent_transactions_for_user(user_id)
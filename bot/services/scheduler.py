@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from bot.services.report import ReportCache
+from bot.services.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class RecurrentScheduler:
+    """
+    Background task materializing due recurrent transactions.
+    Every `interval` seconds claims due `Recurrent` rows in batches of `batch_size` (one transaction per batch,
+    FOR UPDATE SKIP LOCKED), so several bot processes can run it concurrently without double-posting.
+    A backlog is worked off in chunks of at most `max_occurrences` occurrences per recurrent transaction,
+    yielding to the event loop between batches.
+    Each recurrent transaction is renewed in its own savepoint, so a failing one is skipped rather than rolling back
+    (and stalling) the whole batch.
+    """
+
+    def __init__(
+            self,
+            session_pool: async_sessionmaker[AsyncSession],
+            report_cache: Optional[ReportCache] = None,
+            interval: float = 60,
+            batch_size: int = 100,
+            max_occurrences: int = 1000
+    ):
+        self.session_pool = session_pool
+        self.report_cache = report_cache
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_occurrences = max_occurrences
+        self._task: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        """Renews everything due by now. Returns the number of processed recurrent transaction claims."""
+        due_timestamp = datetime.now(tz=timezone.utc)
+        claimed_total = 0
+        failed_ids = set()  # not claimed again in this run, so that they can't stall it
+        while True:
+            async with self.session_pool.begin() as session:
+                repo = Repository(session, report_cache=self.report_cache)
+                claimed = await repo.renew_due_recurrent_transactions(
+                    due_timestamp,
+                    limit=self.batch_size,
+                    max_occurrences=self.max_occurrences,
+                    failed_ids=failed_ids
+                )
+            await repo.publish_invalidations()
+            if not claimed:
+                break
+            claimed_total += claimed
+            # recurrent transactions capped at `max_occurrences` are still due and get claimed again
+            await asyncio.sleep(0)
+        if claimed_total:
+            logger.info(f"Renewed {claimed_total} recurrent transaction(s) due by {due_timestamp}")
+        if failed_ids:
+            logger.warning(f"Failed to renew recurrent transactions {sorted(failed_ids)}, will retry on the next run")
+        return claimed_total
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to renew recurrent transactions")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(), name="recurrent-scheduler")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
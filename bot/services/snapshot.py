@@ -0,0 +1,259 @@
+import json
+import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Sequence, Iterable, Tuple, Dict, Union, Literal
+
+from redis.asyncio import Redis
+
+from bot.db.models import User
+from bot.db.types import AliasableSubtype
+from bot.services.currency_registry import CurrencyRecord, CurrencyRegistry, get_currency_registry
+
+logger = logging.getLogger(__name__)
+
+
+class StorageRecord(NamedTuple):
+    storage_id: int
+    aliasable_id: int
+    number: int
+    name: str
+    is_credit: bool
+    multicurrency: bool
+
+
+class CategoryRecord(NamedTuple):
+    category_id: int
+    aliasable_id: int
+    number: int
+    name: str
+    factor_in: bool
+
+
+class AliasRecord(NamedTuple):
+    alias_id: int
+    aliasable_id: int
+    aliasable_subtype: AliasableSubtype
+    number: int
+    name: str
+
+
+AliasableRecord = Union[CurrencyRecord, StorageRecord, CategoryRecord]
+
+
+class NameIndex:
+    """
+    Compiled lookup of user's currencies, storages, and categories by casefolded name or alias name.
+    Names take precedence over aliases; among equal names the one with the lowest number wins.
+    Currency alpha codes are looked up in the shared `CurrencyRegistry` instead of being copied per user.
+    """
+
+    __slots__ = ("_index", "_currencies")
+
+    def __init__(self, snapshot: "ResolutionSnapshot", currencies: CurrencyRegistry):
+        index: Dict[str, Dict[AliasableSubtype, AliasableRecord]] = {}
+        for storage in snapshot.storages:
+            index.setdefault(storage.name.casefold(), {}).setdefault("storage", storage)
+        for category in snapshot.categories:
+            index.setdefault(category.name.casefold(), {}).setdefault("category", category)
+
+        aliasables: Dict[int, AliasableRecord] = {
+            m.aliasable_id: m for m in (*snapshot.storages, *snapshot.categories)
+        }
+        for alias in snapshot.aliases:
+            if alias.aliasable_subtype == "currency":
+                aliasable = currencies.by_aliasable_id(alias.aliasable_id)
+            else:
+                aliasable = aliasables.get(alias.aliasable_id)
+            if aliasable is not None:
+                index.setdefault(alias.name.casefold(), {}).setdefault(alias.aliasable_subtype, aliasable)
+
+        self._index = index
+        self._currencies = currencies
+
+    def resolve(self, text: str, aliasable_subtype: AliasableSubtype) -> Optional[AliasableRecord]:
+        if aliasable_subtype == "currency" and (currency := self._currencies.by_alpha_code(text)):
+            return currency
+        entry = self._index.get(text.casefold())
+        return entry.get(aliasable_subtype) if entry else None
+
+    def currency(self, text: str) -> Optional[CurrencyRecord]:
+        return self.resolve(text, "currency")
+
+    def storage(self, text: str) -> Optional[StorageRecord]:
+        return self.resolve(text, "storage")
+
+    def category(self, text: str) -> Optional[CategoryRecord]:
+        return self.resolve(text, "category")
+
+
+class ResolutionSnapshot:
+    """
+    Immutable view of everything needed to resolve a plain-text transaction for a single user:
+    defaults, storages, categories, and aliases.
+    Snapshots are versioned; see `SnapshotCache` for how the version is maintained.
+    """
+
+    __slots__ = (
+        "user_id",
+        "version",
+        "default_category_id",
+        "default_storage_id",
+        "default_currency_id",
+        "storages",
+        "categories",
+        "aliases",
+        "_name_index"
+    )
+
+    def __init__(
+            self,
+            user_id: int,
+            version: int,
+            default_category_id: Optional[int],
+            default_storage_id: Optional[int],
+            default_currency_id: Optional[int],
+            storages: Sequence[StorageRecord],
+            categories: Sequence[CategoryRecord],
+            aliases: Sequence[AliasRecord]
+    ):
+        self.user_id = user_id
+        self.version = version
+        self.default_category_id = default_category_id
+        self.default_storage_id = default_storage_id
+        self.default_currency_id = default_currency_id
+        self.storages = tuple(storages)
+        self.categories = tuple(categories)
+        self.aliases = tuple(aliases)
+        self._name_index: Optional[NameIndex] = None
+
+    @property
+    def default_category(self) -> Optional[CategoryRecord]:
+        return next((c for c in self.categories if c.category_id == self.default_category_id), None)
+
+    @property
+    def default_storage(self) -> Optional[StorageRecord]:
+        return next((s for s in self.storages if s.storage_id == self.default_storage_id), None)
+
+    @property
+    def name_index(self) -> NameIndex:
+        """Built on first access and kept for the lifetime of the snapshot, i.e. until its version changes."""
+        if self._name_index is None:
+            self._name_index = NameIndex(self, get_currency_registry())
+        return self._name_index
+
+    def name_taken(
+            self,
+            numbered_subtype: Literal["storage", "category", "alias"],
+            name: str,
+            exclude_number: Optional[int] = None
+    ) -> bool:
+        """Checks whether `name` (case-insensitively) is already used by another storage, category, or alias."""
+        records = {"storage": self.storages, "category": self.categories, "alias": self.aliases}[numbered_subtype]
+        name_casefold = name.casefold()
+        return any(r.name.casefold() == name_casefold and r.number != exclude_number for r in records)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "user_id": self.user_id,
+            "version": self.version,
+            "defaults": [self.default_category_id, self.default_storage_id, self.default_currency_id],
+            "storages": self.storages,
+            "categories": self.categories,
+            "aliases": self.aliases
+        })
+
+    @classmethod
+    def from_json(cls, raw: str | bytes) -> "ResolutionSnapshot":
+        data = json.loads(raw)
+        default_category_id, default_storage_id, default_currency_id = data["defaults"]
+        return cls(
+            user_id=data["user_id"],
+            version=data["version"],
+            default_category_id=default_category_id,
+            default_storage_id=default_storage_id,
+            default_currency_id=default_currency_id,
+            storages=[StorageRecord(*s) for s in data["storages"]],
+            categories=[CategoryRecord(*c) for c in data["categories"]],
+            aliases=[AliasRecord(*a) for a in data["aliases"]]
+        )
+
+    def __repr__(self) -> str:
+        return (f"ResolutionSnapshot(user_id={self.user_id!r}, version={self.version!r}, "
+                f"storages={len(self.storages)}, categories={len(self.categories)}, aliases={len(self.aliases)})")
+
+
+class UserContext(NamedTuple):
+    """
+    User along with their resolution snapshot. Available to handlers as `user_ctx`.
+    When served from cache, `user` is a transient `User` with only `user_id`, `telegram_id`, and `banned` set.
+    """
+    user: User
+    snapshot: ResolutionSnapshot
+
+
+class SnapshotCache:
+    """
+    Two-level (in-process + Redis) cache of `ResolutionSnapshot`s keyed by user_id.
+    Each user has a version counter in Redis, which is incremented whenever their categories, storages,
+    aliases, or defaults change. A cached snapshot is only served if its version matches the counter.
+    """
+
+    def __init__(self, redis: Redis, ttl: int = 24 * 60 * 60, local_maxsize: int = 10_000):
+        self.redis = redis
+        self.ttl = ttl
+        self.local_maxsize = local_maxsize
+        self._local: OrderedDict[int, ResolutionSnapshot] = OrderedDict()
+
+    @staticmethod
+    def _version_key(user_id: int) -> str:
+        return f"snapshot:version:{user_id}"
+
+    @staticmethod
+    def _data_key(user_id: int) -> str:
+        return f"snapshot:data:{user_id}"
+
+    def _store_local(self, snapshot: ResolutionSnapshot) -> None:
+        self._local[snapshot.user_id] = snapshot
+        self._local.move_to_end(snapshot.user_id)
+        while len(self._local) > self.local_maxsize:
+            self._local.popitem(last=False)
+
+    async def get(self, user_id: int) -> Tuple[Optional[ResolutionSnapshot], int]:
+        """
+        Returns a tuple of:
+            - cached snapshot if it is up-to-date, None otherwise;
+            - current snapshot version for the user (to be used when building a new snapshot).
+        """
+        snapshot = self._local.get(user_id)
+        if snapshot is not None:
+            version = int(await self.redis.get(self._version_key(user_id)) or 0)
+            if snapshot.version == version:
+                self._local.move_to_end(user_id)
+                return snapshot, version
+
+        raw_version, raw_snapshot = await self.redis.mget(self._version_key(user_id), self._data_key(user_id))
+        version = int(raw_version or 0)
+        if raw_snapshot is not None:
+            snapshot = ResolutionSnapshot.from_json(raw_snapshot)
+            if snapshot.version == version:
+                self._store_local(snapshot)
+                return snapshot, version
+
+        return None, version
+
+    async def put(self, snapshot: ResolutionSnapshot) -> None:
+        self._store_local(snapshot)
+        await self.redis.set(self._data_key(snapshot.user_id), snapshot.to_json(), ex=self.ttl)
+
+    async def invalidate(self, user_ids: Iterable[int]) -> None:
+        """Bumps snapshot versions. Must be called after the changes are committed."""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                pipe.incr(self._version_key(user_id))
+            await pipe.execute()
+        for user_id in user_ids:
+            self._local.pop(user_id, None)
+        logger.debug(f"Invalidated resolution snapshots for users {user_ids}")
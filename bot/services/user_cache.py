@@ -0,0 +1,42 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Iterable, Tuple
+
+
+class CachedUser(NamedTuple):
+    user_id: int
+    banned: bool
+
+
+class UserCache:
+    """
+    In-process LRU cache of telegram_id -> (user_id, banned), entries expire after `ttl` seconds.
+    Entries are only served along with an up-to-date `SnapshotCache` snapshot of the user, whose version is shared
+    through Redis: `Repository.set_user_banned` bumps it, so every process reloads the user on their next update.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[int, Tuple[float, CachedUser]] = OrderedDict()
+
+    def get(self, telegram_id: int) -> Optional[CachedUser]:
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return None
+        expires_at, cached_user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[telegram_id]
+            return None
+        self._entries.move_to_end(telegram_id)
+        return cached_user
+
+    def put(self, telegram_id: int, user_id: int, banned: bool) -> None:
+        self._entries[telegram_id] = (time.monotonic() + self.ttl, CachedUser(user_id, banned))
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, telegram_ids: Iterable[int]) -> None:
+        for telegram_id in telegram_ids:
+            self._entries.pop(telegram_id, None)
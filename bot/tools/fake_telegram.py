@@ -0,0 +1,147 @@
+"""
+Fake Telegram for testing webhook mode locally.
+
+Serves a stub Bot API (point the bot at it with `TELEGRAM_API_URL`) and posts generated updates
+to the bot's webhook the way Telegram does, then reports acknowledgement latency and how many
+Bot API calls the bot made.
+
+    BOT_MODE=webhook WEBHOOK_SECRET=secret TELEGRAM_API_URL=http://localhost:8081 python -m bot.main
+    python -m bot.tools.fake_telegram --webhook-url http://localhost:8080/webhook --secret secret
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import statistics
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEXTS = ("/help", "/balance", "/list_transactions", "12.50", "100 food")
+
+
+class FakeBotAPI:
+    """Answers every Bot API method with a minimal successful result and counts the calls."""
+
+    def __init__(self):
+        self.calls: Counter[str] = Counter()
+        self._message_ids = itertools.count(1)
+
+    def result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "Shekels", "username": "shekels_bot"}
+        if method in ("sendmessage", "editmessagetext"):
+            return {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", "")
+            }
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = dict(await request.post()) if request.can_read_body else {}
+        self.calls[method] += 1
+        return web.json_response({"ok": True, "result": self.result(method, params)})
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("POST", "/bot{token}/{method}", self.handle)
+        return app
+
+
+def make_update(update_id: int, telegram_id: int, text: str) -> Dict[str, Any]:
+    user = {"id": telegram_id, "is_bot": False, "first_name": f"User{telegram_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": telegram_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text
+        }
+    }
+
+
+async def post_updates(
+        webhook_url: str,
+        secret: str,
+        updates: int,
+        users: int,
+        concurrency: int,
+        texts: List[str]
+) -> List[float]:
+    """Posts updates with at most `concurrency` requests in flight. Returns acknowledgement latencies."""
+    latencies = []
+    statuses: Counter[int] = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with ClientSession(headers={"X-Telegram-Bot-Api-Secret-Token": secret}) as http:
+        async def post(update_id: int) -> None:
+            update = make_update(update_id, telegram_id=10_000 + update_id % users, text=texts[update_id % len(texts)])
+            async with semaphore:
+                started = time.perf_counter()
+                async with http.post(webhook_url, json=update) as response:
+                    await response.read()
+                    statuses[response.status] += 1
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(post(i) for i in range(1, updates + 1)))
+
+    logger.info(f"Webhook responses: {dict(statuses)}")
+    return latencies
+
+
+async def run(args: argparse.Namespace) -> None:
+    api = FakeBotAPI()
+    runner = web.AppRunner(api.build_app())
+    await runner.setup()
+    await web.TCPSite(runner, host="127.0.0.1", port=args.api_port).start()
+    logger.info(f"Fake Bot API listening on http://127.0.0.1:{args.api_port}")
+
+    try:
+        started = time.perf_counter()
+        latencies = await post_updates(
+            args.webhook_url,
+            secret=args.secret,
+            updates=args.updates,
+            users=args.users,
+            concurrency=args.concurrency,
+            texts=args.texts or list(DEFAULT_TEXTS)
+        )
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(args.drain)  # let the bot finish background processing
+
+        latencies.sort()
+        logger.info(
+            f"Posted {len(latencies)} updates in {elapsed:.2f}s ({len(latencies) / elapsed:.0f}/s); "
+            f"ack latency ms: median {statistics.median(latencies) * 1000:.1f}, "
+            f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}, max {latencies[-1] * 1000:.1f}"
+        )
+        logger.info(f"Bot API calls: {dict(api.calls)}")
+    finally:
+        await runner.cleanup()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhook-url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", required=True, help="same as bot's WEBHOOK_SECRET")
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--drain", type=float, default=5.0, help="seconds to keep the fake API up after posting")
+    parser.add_argument("--text", dest="texts", action="append", help="message text to send (repeatable)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,244 @@
+"""
+Load generator: feeds synthetic updates from virtual users through the real Dispatcher (all routers and middlewares,
+local Postgres and Redis from the usual config) with a stub Bot session instead of Telegram.
+Reports throughput, per-update latency percentiles, and SQL statements per update.
+
+Each virtual user is onboarded first (/start, default currency), then sends a random mix of scenarios,
+waiting for each update to be processed before sending the next one, like a real user would.
+
+    THROTTLING_LIMITS='{}' python -m bot.tools.loadgen --users 50 --updates 5000 --mix transaction=6,list=2,fsm=1,onboarding=1
+
+Virtual users get telegram ids starting from `--telegram-id-base`, so don't run it against a production database.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+
+from bot.config import config
+from bot.db.query_log import ensure_query_log, install_query_logging
+from bot.main import build_bot, build_dispatcher, setup_storage
+from bot.services.report import ReportCache
+from bot.tools.fake_telegram import FakeBotAPI, make_update
+from bot.utils.log import setup_logging
+
+logger = logging.getLogger(__name__)
+
+SCENARIOS = ("transaction", "list", "fsm", "onboarding")
+DEFAULT_MIX = "transaction=6,list=2,fsm=1,onboarding=1"
+TRANSACTION_TEXTS = ("12.50", "-3.99", "+1000 Wallet", "600/3", "5.5 usd Wallet Uncategorized", "7 eur Uncategorized")
+LIST_TEXTS = (
+    "/list_transactions",
+    "/list_categories",
+    "/list_storages",
+    "/list_aliases",
+    "/list_recurrent",
+    "/balance",
+    "/report"
+)
+ONBOARDING_TEXTS = ("/start", "/set_default_currency", "USD")
+
+
+class RecordingSession(BaseSession):
+    """Bot session answering every request locally, the same way `FakeBotAPI` does, and counting the calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.api = FakeBotAPI()
+
+    async def make_request(
+            self,
+            bot: Bot,
+            method: TelegramMethod[TelegramType],
+            timeout: Optional[int] = None
+    ) -> TelegramType:
+        name = method.__api_method__.lower()
+        self.api.calls[name] += 1
+        params = {"chat_id": getattr(method, "chat_id", 0), "text": getattr(method, "text", "")}
+        content = json.dumps({"ok": True, "result": self.api.result(name, params)})
+        return self.check_response(bot, method, status_code=200, content=content).result
+
+    async def stream_content(
+            self,
+            url: str,
+            headers: Optional[Dict[str, Any]] = None,
+            timeout: int = 30,
+            chunk_size: int = 65536,
+            raise_for_status: bool = True
+    ) -> AsyncGenerator[bytes, None]:
+        raise NotImplementedError("Downloading files is not supported by the load generator")
+        yield b""
+
+    async def close(self) -> None:
+        pass
+
+
+class QueryCountMiddleware(BaseMiddleware):
+    """Outer middleware recording how many SQL statements each update executed."""
+
+    def __init__(self):
+        super().__init__()
+        self.counts: List[int] = []
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        session = data.get("session")
+        if session is None:
+            return await handler(event, data)
+        log = ensure_query_log(session)
+        try:
+            return await handler(event, data)
+        finally:
+            self.counts.append(len(log))
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for item in mix.split(","):
+        scenario, _, weight = item.partition("=")
+        scenario = scenario.strip()
+        if scenario not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {scenario!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[scenario] = float(weight or 1)
+    return weights
+
+
+class LoadGenerator:
+    def __init__(self, dp, bot: Bot, mix: Dict[str, float], telegram_id_base: int, seed: int):
+        self.dp = dp
+        self.bot = bot
+        self.mix = mix
+        self.rng = random.Random(seed)
+        self._update_ids = itertools.count(1)
+        self._telegram_ids = itertools.count(telegram_id_base)
+        self._names = itertools.count(1)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Counter[str] = Counter()
+
+    def _texts(self, scenario: str) -> List[str]:
+        if scenario == "transaction":
+            return [self.rng.choice(TRANSACTION_TEXTS)]
+        if scenario == "list":
+            return [self.rng.choice(LIST_TEXTS)]
+        if scenario == "fsm":
+            return ["/add_category", f"lg{next(self._names)}", self.rng.choice(("yes", "no"))]
+        return list(ONBOARDING_TEXTS)
+
+    async def send(self, telegram_id: int, text: str, scenario: str) -> None:
+        update = make_update(next(self._update_ids), telegram_id=telegram_id, text=text)
+        started = time.perf_counter()
+        try:
+            result = await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            logger.warning(f"Update {text!r} from {telegram_id} failed: {e!r}")
+            self.outcomes["error"] += 1
+            return
+        self.latencies[scenario].append(time.perf_counter() - started)
+        self.outcomes["unhandled" if result is UNHANDLED else "handled"] += 1
+
+    async def run_scenario(self, telegram_id: int, scenario: str) -> int:
+        """Returns the number of updates sent."""
+        if scenario == "onboarding":
+            telegram_id = next(self._telegram_ids)  # onboarding is always a new user
+        texts = self._texts(scenario)
+        for text in texts:
+            await self.send(telegram_id, text, scenario)
+        return len(texts)
+
+    async def virtual_user(self, updates: int) -> None:
+        telegram_id = next(self._telegram_ids)
+        for text in ONBOARDING_TEXTS:
+            await self.send(telegram_id, text, "setup")
+        scenarios, weights = zip(*self.mix.items())
+        sent = 0
+        while sent < updates:
+            scenario = self.rng.choices(scenarios, weights)[0]
+            sent += await self.run_scenario(telegram_id, scenario)
+
+    async def run(self, users: int, updates: int) -> float:
+        started = time.perf_counter()
+        per_user, remainder = divmod(updates, users)
+        await asyncio.gather(*(self.virtual_user(per_user + (i < remainder)) for i in range(users)))
+        return time.perf_counter() - started
+
+
+def report(generator: LoadGenerator, elapsed: float, query_counts: List[int], api_calls: Counter[str]) -> None:
+    total = sum(generator.outcomes.values())
+    logger.info(f"{total} updates in {elapsed:.2f}s: {total / elapsed:.0f} updates/s; {dict(generator.outcomes)}")
+    logger.info(f"{'scenario':<12} {'updates':>8} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'max, ms':>9}")
+    all_latencies = sorted(itertools.chain.from_iterable(generator.latencies.values()))
+    for scenario, latencies in (*sorted(generator.latencies.items()), ("all", all_latencies)):
+        latencies = sorted(latencies)
+        logger.info(
+            f"{scenario:<12} {len(latencies):>8} "
+            f"{percentile(latencies, 0.50) * 1000:>9.1f} {percentile(latencies, 0.95) * 1000:>9.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>9.1f} {latencies[-1] * 1000 if latencies else 0:>9.1f}"
+        )
+    if query_counts:
+        query_counts = sorted(query_counts)
+        logger.info(
+            f"SQL statements per update: mean {sum(query_counts) / len(query_counts):.1f}, "
+            f"p95 {percentile(query_counts, 0.95)}, max {query_counts[-1]}"
+        )
+    logger.info(f"Bot API calls: {dict(api_calls)}")
+
+
+async def run(args: argparse.Namespace) -> None:
+    engine, sessionmaker, redis_storage = await setup_storage()
+    install_query_logging(engine)
+    dp = build_dispatcher(
+        session_pool=sessionmaker,
+        redis_storage=redis_storage,
+        report_cache=ReportCache(redis=redis_storage.redis)
+    )
+    query_counter = QueryCountMiddleware()
+    dp.message.outer_middleware(query_counter)
+    dp.callback_query.outer_middleware(query_counter)
+
+    session = RecordingSession()
+    bot = build_bot(session=session)
+    generator = LoadGenerator(dp, bot, mix=args.mix, telegram_id_base=args.telegram_id_base, seed=args.seed)
+    try:
+        elapsed = await generator.run(users=args.users, updates=args.updates)
+        report(generator, elapsed, query_counter.counts, session.api.calls)
+    finally:
+        await redis_storage.close()
+        await engine.dispose()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--updates", type=int, default=2000, help="updates to send in total, besides onboarding of the virtual users")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help=f"scenario weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--telegram-id-base", type=int, default=9_000_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    setup_logging(config=config)
+    asyncio.run(run(parse_args()))
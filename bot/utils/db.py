@@ -1,21 +1,68 @@
 import os
 import json
+import asyncio
 import logging
+from uuid import uuid4
 
-from typing import List, Dict, Union
+from typing import List, Dict, Set, Union, Optional
 
-from sqlalchemy import MetaData, inspect
-from sqlalchemy.schema import ForeignKeyConstraint, Table, DropConstraint, DropTable
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, AsyncEngine
+from sqlalchemy import MetaData, inspect, select, text, update, func, bindparam, Connection
+from sqlalchemy.schema import (
+    ForeignKeyConstraint, Table, DropConstraint, DropTable, UniqueConstraint, AddConstraint, Index
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, AsyncEngine, create_async_engine
 from sqlalchemy.dialects.postgresql import insert
 
 from bot.db.models import Currency, Aliasable, User
-from bot.config import CURRENCY_DATA_PATH
+from bot.db.pool import TimedAsyncAdaptedQueuePool
+from bot.config import Settings, CURRENCY_DATA_PATH
 from bot.services.repository import Repository
 
 logger = logging.getLogger(__name__)
 
 
+def create_engine(config: Settings) -> AsyncEngine:
+    """
+    Creates the engine with pool settings from `config`.
+    In PgBouncer transaction pooling mode consecutive statements may run on different server connections,
+    so named prepared statements are disabled (asyncpg and SQLAlchemy statement caches are turned off,
+    and the remaining unnamed statements get unique names), and no startup parameters are sent.
+    """
+    if config.POSTGRES_PGBOUNCER_TRANSACTION_MODE:
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__"
+        }
+    else:
+        connect_args = {
+            "prepared_statement_cache_size": config.POSTGRES_STATEMENT_CACHE_SIZE,
+            "server_settings": {"jit": "off"}
+        }
+    engine = create_async_engine(
+        url=config.POSTGRES_DSN.unicode_string(),
+        echo=False,
+        connect_args=connect_args,
+        poolclass=TimedAsyncAdaptedQueuePool,
+        pool_size=config.POSTGRES_POOL_SIZE,
+        max_overflow=config.POSTGRES_POOL_MAX_OVERFLOW,
+        pool_timeout=config.POSTGRES_POOL_TIMEOUT,
+        pool_recycle=config.POSTGRES_POOL_RECYCLE
+    )
+    engine.pool.slow_checkout_threshold = config.POSTGRES_POOL_SLOW_CHECKOUT
+    return engine
+
+
+async def prewarm_pool(engine: AsyncEngine, connections: int) -> None:
+    """Opens `connections` connections at once and returns them to the pool, so that first updates don't pay for it."""
+    async def touch() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(touch() for _ in range(connections)))
+    logger.info(f"Prewarmed DB pool: {engine.pool.status()}")
+
+
 async def get_table_names(engine: AsyncEngine) -> List[str]:
     async with engine.begin() as conn:
         # 'conn.run_sync(callable)' passes conn as the first argument to the callable
@@ -28,6 +75,162 @@ def get_currency_data(currency_json_path: Union[os.PathLike, str, bytes] = CURRE
     return currency_data
 
 
+async def sync_currencies(session: AsyncSession, currency_data: List[Dict]) -> int:
+    """
+    Inserts currencies from `currency_data` missing from the `currency` table and updates names and symbols
+    of the existing ones. Safe to re-run. Takes three statements regardless of the number of currencies.
+    Returns the number of inserted currencies.
+    """
+    r = await session.execute(select(Currency.alpha_code, Currency.aliasable_id))
+    aliasable_ids = {alpha_code: aliasable_id for alpha_code, aliasable_id in r.all()}
+
+    missing = [c for c in currency_data if c["alpha_code"] not in aliasable_ids]
+    if missing:
+        r = await session.execute(
+            insert(Aliasable).returning(Aliasable.aliasable_id, sort_by_parameter_order=True),
+            [{"aliasable_subtype": "currency"} for _ in missing]
+        )
+        for currency_values, aliasable_id in zip(missing, r.scalars().all()):
+            aliasable_ids[currency_values["alpha_code"]] = aliasable_id
+
+    stmt = insert(Currency)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[Currency.alpha_code],
+            set_={"name": stmt.excluded.name, "symbol": stmt.excluded.symbol}
+        ),
+        [{"aliasable_id": aliasable_ids[c["alpha_code"]]} | c for c in currency_data]
+    )
+    return len(missing)
+
+
+def _unique_key(unique: Union[UniqueConstraint, Index]) -> list:
+    return list(unique.columns) if isinstance(unique, UniqueConstraint) else list(unique.expressions)
+
+
+def _count_duplicate_keys(conn: Connection, table: Table, key: list) -> int:
+    duplicates = select(*key).select_from(table).group_by(*key).having(func.count() > 1).subquery()
+    return conn.execute(select(func.count()).select_from(duplicates)).scalar_one()
+
+
+def _renumber_duplicate_numbers(conn: Connection, table: Table) -> None:
+    """Renumbers (from 1, keeping the order) entities of users having several entities with the same number."""
+    primary_key = table.primary_key.columns[0]
+    affected_user_ids = (
+        select(table.c.user_id)
+        .group_by(table.c.user_id, table.c.number)
+        .having(func.count() > 1)
+    )
+    renumbered = (
+        select(
+            primary_key.label("id"),
+            func.row_number().over(partition_by=table.c.user_id, order_by=(table.c.number, primary_key)).label("number")
+        )
+        .where(table.c.user_id.in_(affected_user_ids))
+        .subquery()
+    )
+    r = conn.execute(
+        update(table)
+        .where(primary_key == renumbered.c.id, table.c.number != renumbered.c.number)
+        .values(number=renumbered.c.number)
+    )
+    logger.warning(f"Renumbered {r.rowcount} rows of `{table.name}` to resolve duplicate numbers")
+
+
+def _rename_duplicate_names(conn: Connection, table: Table) -> None:
+    """
+    Renames entities whose names differ only by case from the name of another entity of the same user:
+    all but the first one (by number) get a '_2', '_3', ... suffix, truncated to fit the column.
+    """
+    primary_key = table.primary_key.columns[0]
+    lower_name = func.lower(table.c.name)
+    affected_user_ids = (
+        select(table.c.user_id)
+        .group_by(table.c.user_id, lower_name)
+        .having(func.count() > 1)
+    )
+    rows = conn.execute(
+        select(primary_key, table.c.user_id, table.c.name)
+        .where(table.c.user_id.in_(affected_user_ids))
+        .order_by(table.c.user_id, table.c.number, primary_key)
+    ).all()
+    max_length = table.c.name.type.length
+    taken: Dict[int, Set[str]] = {}
+    duplicates = []
+    for id_, user_id, name in rows:  # names kept as they are go first, so that suffixed names don't take them
+        user_names = taken.setdefault(user_id, set())
+        if name.lower() in user_names:
+            duplicates.append((id_, user_id, name))
+        else:
+            user_names.add(name.lower())
+    renames = []
+    for id_, user_id, name in duplicates:
+        user_names = taken[user_id]
+        i = 2
+        while True:
+            suffix = f"_{i}"  # names must stay valid for `NameFilter` and `TRANSACTION_PATTERN`
+            new_name = name[:max_length - len(suffix)] + suffix if max_length else name + suffix
+            if new_name.lower() not in user_names:
+                break
+            i += 1
+        user_names.add(new_name.lower())
+        renames.append({"id": id_, "new_name": new_name})
+        logger.warning(f"Renaming `{table.name}` {id_} of user {user_id} from {name!r} to {new_name!r}: duplicate name")
+    if renames:
+        conn.execute(
+            update(table).where(primary_key == bindparam("id")).values(name=bindparam("new_name")),
+            renames
+        )
+
+
+def _deduplicate_unique_key(conn: Connection, table: Table, unique: Union[UniqueConstraint, Index]) -> bool:
+    """
+    Resolves rows violating a unique constraint or index about to be added, as far as it can be done automatically:
+    per-user numbers are renumbered, per-user names get suffixes.
+    Returns False if there are still duplicates, e.g. for keys without a known resolution.
+    """
+    key = _unique_key(unique)
+    duplicates = _count_duplicate_keys(conn, table, key)
+    if not duplicates:
+        return True
+    logger.warning(f"`{table.name}` has {duplicates} duplicate keys for `{unique.name}`, resolving...")
+    if "user_id" in table.c and "number" in table.c and any(c is table.c.number for c in key):
+        _renumber_duplicate_numbers(conn, table)
+    elif "user_id" in table.c and "name" in table.c and isinstance(unique, Index):  # (user_id, lower(name))
+        _rename_duplicate_names(conn, table)
+    duplicates = _count_duplicate_keys(conn, table, key)
+    if duplicates:
+        logger.error(
+            f"Not creating `{unique.name}` on `{table.name}`: {duplicates} duplicate keys are left, "
+            f"resolve them manually and restart"
+        )
+    return not duplicates
+
+
+def _create_missing_indexes_and_constraints(conn: Connection, metadata: MetaData) -> None:
+    """
+    Brings indexes and unique constraints of existing tables in line with `metadata`.
+    Only creates missing ones (by name); nothing is altered or dropped.
+    Existing rows that would violate a new unique constraint or index are resolved first, see `_deduplicate_unique_key`.
+    """
+    inspector = inspect(conn)
+    for table in metadata.sorted_tables:
+        index_names = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        constraint_names = {uc["name"] for uc in inspector.get_unique_constraints(table.name)}
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name and constraint.name not in constraint_names:
+                if not _deduplicate_unique_key(conn, table, constraint):
+                    continue
+                logger.info(f"Adding constraint `{constraint.name}` to `{table.name}`...")
+                conn.execute(AddConstraint(constraint))
+        for index in table.indexes:
+            if index.name not in index_names:
+                if index.unique and not _deduplicate_unique_key(conn, table, index):
+                    continue
+                logger.info(f"Creating index `{index.name}` on `{table.name}`...")
+                index.create(conn)
+
+
 async def init_database(metadata: MetaData, engine: AsyncEngine, session_pool: async_sessionmaker[AsyncSession]) -> None:
     table_names = await get_table_names(engine=engine)
     if not table_names:
@@ -35,16 +238,29 @@ async def init_database(metadata: MetaData, engine: AsyncEngine, session_pool: a
         async with engine.begin() as conn:
             await conn.run_sync(metadata.create_all)
         logger.info("All tables are created.")
-        async with session_pool.begin() as session:
-            currency_data = get_currency_data()
-            logger.info("Inserting `currency` data...")
-            for _, currency_values in enumerate(currency_data):
-                res = await session.execute(insert(Aliasable).values({"aliasable_subtype": "currency"}))
-                id_inserted = res.inserted_primary_key[0]
-                await session.execute(insert(Currency).values({"aliasable_id": id_inserted} | currency_values))
-            logger.info("Populated `currency` with data.")
     else:
-        logger.info("Tables are already created.")
+        logger.info("Tables are already created. Migrating schema...")
+        async with engine.begin() as conn:
+            await conn.run_sync(metadata.create_all)  # only creates missing tables
+            await conn.run_sync(_create_missing_indexes_and_constraints, metadata)
+        logger.info("Schema is up to date.")
+    created_table_names = set(metadata.tables) - set(table_names)
+    async with session_pool.begin() as session:
+        logger.info("Syncing `currency` data...")
+        inserted = await sync_currencies(session, currency_data=get_currency_data())
+        logger.info(f"Synced `currency` data, {inserted} new currencies inserted.")
+        if table_names:
+            await _backfill_aggregates(Repository(session), created_table_names)
+
+
+async def _backfill_aggregates(repo: Repository, created_table_names: Set[str]) -> None:
+    """Fills aggregate tables that were just added to an existing database."""
+    if "storage_balance" in created_table_names:
+        logger.info("Backfilling `storage_balance`...")
+        await repo.rebuild_storage_balances()
+    if "monthly_rollup" in created_table_names:
+        logger.info("Backfilling `monthly_rollup`...")
+        await repo.rebuild_monthly_rollups()
 
 
 async def drop_all_tables(engine: AsyncEngine):
@@ -70,9 +286,11 @@ async def drop_all_tables(engine: AsyncEngine):
     logger.info("Dropped all tables.")
 
 
-async def add_and_init_user(telegram_id: int, first_name: str, banned: bool, repo: Repository) -> User:
+async def add_and_init_user(telegram_id: int, first_name: str, banned: bool, repo: Repository) -> Optional[User]:
+    """Adds a user with default category and storage. Returns None if the user has been added concurrently."""
     user = await repo.add_user(telegram_id, first_name, banned)
-    await repo.session.flush()
+    if user is None:
+        return None
 
     category = await repo.add_category(
         user_id=user.user_id,
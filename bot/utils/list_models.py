@@ -1,5 +1,17 @@
+from collections import defaultdict
+from datetime import date
+from typing import Optional, Tuple, Dict
+
+from aiogram.types import InlineKeyboardMarkup
+
 from bot.db.models import Category, Storage
+from bot.money import Money
+from bot.keyboards import TransactionPageCallback, transaction_page_keyboard
+from bot.services.currency_registry import get_currency_registry
 from bot.services.repository import Repository
+from bot.services.snapshot import ResolutionSnapshot
+
+TRANSACTION_PAGE_SIZE = 20
 
 
 def _format_category(category: Category, category_default: Category | None) -> str:
@@ -38,20 +50,82 @@ async def get_alias_list(user_id: int, repo: Repository) -> str:
     return aliases_str
 
 
+def _format_balance(balance: dict) -> str:
+    return f"    {balance['amount']:.2f} {balance['currency_symbol']}"
+
+
+async def get_balance_list(user_id: int, repo: Repository) -> str:
+    balances = await repo.get_storage_balances_for_user(user_id)
+    lines = []
+    storage_number = None
+    for b in balances:
+        if b['storage_number'] != storage_number:
+            storage_number = b['storage_number']
+            lines.append(f"{b['storage_number']}. {b['storage_name']}")
+        lines.append(_format_balance(b))
+    return '\n'.join(lines)
+
+
+async def get_report(snapshot: ResolutionSnapshot, month: date, repo: Repository) -> str:
+    rows = await repo.get_monthly_rollup_for_user(snapshot.user_id, month)
+    if not rows:
+        return ""
+    currencies = get_currency_registry()
+    categories = {c.category_id: c for c in snapshot.categories}
+    rows = sorted(rows, key=lambda r: (categories[r.category_id].number if r.category_id in categories else 0))
+
+    lines = []
+    totals: Dict[int, int] = defaultdict(int)  # cents by currency
+    for r in rows:
+        category = categories.get(r.category_id)
+        category_name = category.name if category else "(deleted)"
+        lines.append(f"{category_name}: {r.total:.2f} {currencies.get(r.currency_id).symbol} ({r.count})")
+        if category is None or category.factor_in:
+            totals[r.currency_id] += r.total.cents
+    totals_str = ", ".join(
+        f"{Money(cents)} {currencies.get(currency_id).symbol}" for currency_id, cents in totals.items()
+    )
+    lines.append(f"\nTotal: {totals_str}")
+    return '\n'.join(lines)
+
+
 def _format_transaction(transaction: dict) -> str:
-    return (f"{transaction['Transaction'].timestamp.strftime('%m.%d %H:%M')} | "
-            f"{transaction['Transaction'].amount:.2f} "
+    return (f"{transaction['timestamp'].strftime('%m.%d %H:%M')} | "
+            f"{transaction['amount']:.2f} "
             f"{transaction['currency_symbol']} | "
             f"{transaction['storage_name']} | "
             f"({transaction['category_name']})")
 
 
-async def get_transaction_list(user_id: int, repo: Repository) -> str:
-    transactions = await repo.get_transactions_with_names_for_user(user_id)
+async def get_transaction_page(
+        user_id: int,
+        repo: Repository,
+        cursor: Optional[TransactionPageCallback] = None
+) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """
+    Returns a single page of user's transactions (newest first) along with the navigation keyboard.
+    Without `cursor` returns the most recent page.
+    """
+    before = cursor.keyset if cursor and cursor.direction == "older" else None
+    after = cursor.keyset if cursor and cursor.direction == "newer" else None
+    # one extra row tells whether there is anything beyond this page
+    transactions = await repo.get_transaction_page_with_names_for_user(
+        user_id,
+        limit=TRANSACTION_PAGE_SIZE + 1,
+        before=before,
+        after=after
+    )
+    has_more = len(transactions) > TRANSACTION_PAGE_SIZE
+    if after is not None:
+        transactions = transactions[-TRANSACTION_PAGE_SIZE:]
+        has_newer, has_older = has_more, True
+    else:
+        transactions = transactions[:TRANSACTION_PAGE_SIZE]
+        has_newer, has_older = before is not None, has_more
     if not transactions:
-        return "No transactions yet."
+        return "", None
     transactions_str = '\n'.join([_format_transaction(t) for t in transactions])
-    return transactions_str
+    return transactions_str, transaction_page_keyboard(transactions, has_newer=has_newer, has_older=has_older)
 
 
 def _format_recurrent_transaction(rt: dict) -> str:
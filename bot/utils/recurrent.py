@@ -1,27 +1,114 @@
-from datetime import datetime
-from dateutil.relativedelta import relativedelta
+from calendar import monthrange
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
 
 from bot.db.types import RecurrentPeriodUnit
 
+_DAYS_PER_UNIT = {"day": 1, "week": 7}
+_MONTHS_PER_UNIT = {"month": 1, "year": 12}
+
+
+def _resolve_up_to_timestamp(next_timestamp: datetime, up_to_timestamp: Optional[datetime]) -> datetime:
+    if not up_to_timestamp:
+        return datetime.now(tz=next_timestamp.tzinfo)
+    if not up_to_timestamp.tzinfo:
+        return up_to_timestamp.replace(tzinfo=next_timestamp.tzinfo)
+    return up_to_timestamp
+
+
+def _add_months(timestamp: datetime, months: int) -> datetime:
+    """Same as adding `relativedelta(months=months)`, without constructing one."""
+    years, month_index = divmod(timestamp.month - 1 + months, 12)
+    year, month = timestamp.year + years, month_index + 1
+    return timestamp.replace(year=year, month=month, day=min(timestamp.day, monthrange(year, month)[1]))
+
+
+def nth_recurrent_timestamp(
+        start_timestamp: datetime,
+        period: int,
+        period_unit: RecurrentPeriodUnit,
+        n: int
+) -> datetime:
+    """
+    Returns the n-th (0-based) occurrence of a schedule starting at `start_timestamp`.
+    Every occurrence is counted from `start_timestamp` itself, so day-of-month clamping doesn't accumulate
+    (Jan 31 + 2 months is Mar 31, not Mar 28).
+    """
+    if period_unit in _DAYS_PER_UNIT:
+        return start_timestamp + timedelta(days=n * period * _DAYS_PER_UNIT[period_unit])
+    return _add_months(start_timestamp, n * period * _MONTHS_PER_UNIT[period_unit])
+
+
+def count_recurrent_timestamps(
+        start_timestamp: datetime,
+        period: int,
+        period_unit: RecurrentPeriodUnit,
+        up_to_timestamp: datetime
+) -> int:
+    """Returns the number of occurrences starting from `start_timestamp` that are not later than `up_to_timestamp`."""
+    if up_to_timestamp < start_timestamp:
+        return 0
+    if period_unit in _DAYS_PER_UNIT:
+        return (up_to_timestamp - start_timestamp) // timedelta(days=period * _DAYS_PER_UNIT[period_unit]) + 1
+
+    months = (up_to_timestamp.year - start_timestamp.year) * 12 + (up_to_timestamp.month - start_timestamp.month)
+    count = months // (period * _MONTHS_PER_UNIT[period_unit]) + 1
+    # the estimate is off by at most one, depending on the day and time within the month
+    if nth_recurrent_timestamp(start_timestamp, period, period_unit, count - 1) > up_to_timestamp:
+        count -= 1
+    return count
+
+
+def _next_index(
+        start_timestamp: datetime,
+        period: int,
+        period_unit: RecurrentPeriodUnit,
+        next_timestamp: datetime
+) -> int:
+    """Index of the first occurrence not earlier than `next_timestamp`, i.e. the number of occurrences before it."""
+    return count_recurrent_timestamps(start_timestamp, period, period_unit, next_timestamp - timedelta(microseconds=1))
+
+
+def iter_recurrent_timestamps(
+        start_timestamp: datetime,
+        next_timestamp: datetime,
+        period: int,
+        period_unit: RecurrentPeriodUnit,
+        up_to_timestamp: datetime = None,
+        limit: int = None
+) -> Iterator[datetime]:
+    """
+    Lazily yields occurrences of the schedule starting at `start_timestamp`, from `next_timestamp`
+    up to `up_to_timestamp` (now by default), at most `limit` of them.
+    """
+    up_to_timestamp = _resolve_up_to_timestamp(next_timestamp, up_to_timestamp)
+    first = _next_index(start_timestamp, period, period_unit, next_timestamp)
+    count = max(0, count_recurrent_timestamps(start_timestamp, period, period_unit, up_to_timestamp) - first)
+    if limit is not None:
+        count = min(count, limit)
+    for n in range(first, first + count):
+        yield nth_recurrent_timestamp(start_timestamp, period, period_unit, n)
+
 
 def recurrent_timestamps(
+        start_timestamp: datetime,
         next_timestamp: datetime,
         period: int,
         period_unit: RecurrentPeriodUnit,
-        up_to_timestamp: datetime = None
+        up_to_timestamp: datetime = None,
+        limit: int = None
 ) -> tuple[list[datetime], datetime]:
     """
     Returns a tuple of:
-        - list of timestamps starting from `next_timestamp` up to `up_to_timestamp` with given periodicity;
-        - next timestamp after `up_to`.
+        - list of occurrences of the schedule starting at `start_timestamp`, from `next_timestamp`
+          up to `up_to_timestamp`, at most `limit` of them;
+        - next occurrence after the returned ones.
+    Occurrences only depend on `start_timestamp`, so renewing in chunks gives the same ones as renewing at once.
     """
-    relativedelta_kwargs = {f"{period_unit}s": period}
-    if not up_to_timestamp:
-        up_to_timestamp = datetime.now(tz=next_timestamp.tzinfo)
-    else:
-        if not up_to_timestamp.tzinfo:
-            up_to_timestamp = up_to_timestamp.replace(tzinfo=next_timestamp.tzinfo)
-    timestamps = [next_timestamp]
-    while timestamps[-1] <= up_to_timestamp:
-        timestamps.append(timestamps[-1] + relativedelta(**relativedelta_kwargs))
-    return timestamps[:-1], timestamps[-1]
+    up_to_timestamp = _resolve_up_to_timestamp(next_timestamp, up_to_timestamp)
+    first = _next_index(start_timestamp, period, period_unit, next_timestamp)
+    count = max(0, count_recurrent_timestamps(start_timestamp, period, period_unit, up_to_timestamp) - first)
+    if limit is not None:
+        count = min(count, limit)
+    timestamps = [nth_recurrent_timestamp(start_timestamp, period, period_unit, n) for n in range(first, first + count)]
+    return timestamps, nth_recurrent_timestamp(start_timestamp, period, period_unit, first + count)
@@ -1,35 +1,81 @@
+import re
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 from dateutil.relativedelta import relativedelta
 
+from bot.money import Money
 
-def assume_sign(money: str) -> float:
-    """Assumes negative sign if not explicitly specified."""
-    if '+' in money or '-' in money:
-        money = float(money)
-    else:
-        money = -float(money)  # negative amount by default
-    return money
+TRANSACTION_PATTERN = re.compile(
+    r"([+-]?)(\d+)(?:\.(\d{,2}))?"  # amount: sign, whole part, fraction (required)
+    r"(?:/(\d+))?"  # months for installment payments (optional)
+    r"(?:\s+([\w\-.]+))?"  # currency (optional)
+    r"(?:\s+([\w\-.]+))?"  # storage (optional)
+    r"(?:\s+([\w\-.]+))?"  # category (optional)
+)
 
 
-def split_float_conserve_sum(money: float, parts: int) -> list[float]:
+class ParsedTransaction:
     """
-        Splits a float `money` into `parts` parts, conserving the sum.
-        Assumes `money` is rounded to 2 decimal places. If not, rounds it.
-        Returns a list of floats that sum to `money`.
+    Transaction message line, parsed but not resolved yet: signed amount, number of monthly installments,
+    and up to three name slots (currency, storage, category; see `resolve_slots` for how they are interpreted).
     """
-    sign = 1 if money > 0 else -1  # sign treated separately for proper integer division and modulo
-    money = abs(money)
-    money = round(money, 2)
-    money_cents = int(money * 100)
-    part_cents, remaining_cents = divmod(money_cents, parts)
+
+    __slots__ = ("amount", "months", "slots")
+
+    def __init__(self, amount: Money, months: int, slots: Tuple[Optional[str], Optional[str], Optional[str]]):
+        self.amount = amount
+        self.months = months
+        self.slots = slots
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ParsedTransaction):
+            return NotImplemented
+        return (self.amount, self.months, self.slots) == (other.amount, other.months, other.slots)
+
+    def __repr__(self) -> str:
+        return f"ParsedTransaction(amount={self.amount!r}, months={self.months!r}, slots={self.slots!r})"
+
+
+def _signed_money(sign: str, whole: str, fraction: Optional[str]) -> Money:
+    """Negative unless `sign` is '+', same as `assume_sign`."""
+    cents = int(whole + (fraction or "").ljust(2, "0"))
+    return Money(cents if sign == "+" else -cents)
+
+
+def parse_transaction(line: str) -> Optional[ParsedTransaction]:
+    """Parses a single transaction line, returns None if it doesn't match `TRANSACTION_PATTERN`."""
+    match = TRANSACTION_PATTERN.fullmatch(line)
+    if match is None:
+        return None
+    sign, whole, fraction, months, slot_0, slot_1, slot_2 = match.groups()
+    return ParsedTransaction(
+        amount=_signed_money(sign, whole, fraction),
+        months=1 if months is None else int(months),
+        slots=(slot_0, slot_1, slot_2)
+    )
+
+
+def parse_transaction_lines(text: str) -> List[Tuple[int, Optional[ParsedTransaction]]]:
+    """Parses a message with one transaction per line. Returns (line number, parsed or None) for non-blank lines."""
+    if "\n" not in text:  # the common case
+        return [(1, parse_transaction(text.strip()))] if text and not text.isspace() else []
     return [
-        sign * round((part_cents + int(i < remaining_cents)) / 100, 2)
-        for i in range(parts)
+        (i, parse_transaction(line.strip()))
+        for i, line in enumerate(text.splitlines(), start=1)
+        if line and not line.isspace()
     ]
 
 
-async def split_transaction(amount_total: float, months: int, start_date: datetime = None) -> tuple[list[datetime], list[float]]:
+def assume_sign(money: str) -> Money:
+    """Assumes negative sign if not explicitly specified."""
+    amount = Money.from_str(money)
+    if '+' in money or '-' in money:
+        return amount
+    return -amount  # negative amount by default
+
+
+async def split_transaction(amount_total: Money, months: int, start_date: datetime = None) -> tuple[list[datetime], list[Money]]:
     """
         Meant for installment payments.
         For `months` > 1 splits transaction into multiple transactions 1 month apart with `amount_total` equally
@@ -38,7 +84,7 @@ async def split_transaction(amount_total: float, months: int, start_date: dateti
         Returns a tuple of two lists: timestamps and amounts.
     """
 
-    amounts = split_float_conserve_sum(amount_total, months)
+    amounts = amount_total.split(months)
 
     if not start_date:
         start_date = datetime.now()
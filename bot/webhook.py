@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from typing import Any, Dict
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from bot.config import Settings
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Acknowledges every update with 200 right away and processes it in the background,
+    with at most `max_concurrent_updates` updates being processed at a time.
+    """
+
+    def __init__(
+            self,
+            dispatcher: Dispatcher,
+            bot: Bot,
+            max_concurrent_updates: int,
+            secret_token: str | None = None,
+            **data: Any
+    ):
+        super().__init__(dispatcher, bot, handle_in_background=True, secret_token=secret_token, **data)
+        self._semaphore = asyncio.Semaphore(max_concurrent_updates)
+
+    async def _background_feed_update(self, bot: Bot, update: Dict[str, Any]) -> None:
+        async with self._semaphore:
+            try:
+                await super()._background_feed_update(bot, update)
+            except Exception:
+                logger.exception(f"Failed to process update {update.get('update_id')}")
+
+    async def close(self) -> None:
+        """Waits for updates in progress before closing the bot session."""
+        if self._background_feed_update_tasks:
+            await asyncio.gather(*self._background_feed_update_tasks, return_exceptions=True)
+        await super().close()
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, config: Settings) -> web.Application:
+    app = web.Application()
+    BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_concurrent_updates=config.WEBHOOK_MAX_CONCURRENT_UPDATES,
+        secret_token=config.WEBHOOK_SECRET.get_secret_value()
+    ).register(app, path=config.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Settings) -> None:
+    """Serves the webhook until cancelled. Registers it with Telegram if `WEBHOOK_BASE_URL` is set."""
+    runner = web.AppRunner(build_webhook_app(dp, bot, config))
+    await runner.setup()
+    site = web.TCPSite(runner, host=config.WEBHOOK_HOST, port=config.WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Serving webhook on {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+
+    if config.WEBHOOK_BASE_URL:
+        await bot.set_webhook(
+            url=f"{config.WEBHOOK_BASE_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+            secret_token=config.WEBHOOK_SECRET.get_secret_value(),
+            max_connections=min(config.WEBHOOK_MAX_CONCURRENT_UPDATES, 100),
+            allowed_updates=dp.resolve_used_update_types()
+        )
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
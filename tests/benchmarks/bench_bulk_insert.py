@@ -0,0 +1,72 @@
+"""
+Compares inserting transactions as ORM objects (`session.add_all`) with the core multi-row INSERT
+used by `Repository._insert_transactions`.
+Uses in-memory SQLite, so only relative numbers are meaningful.
+
+Run with `python -m tests.benchmarks.bench_bulk_insert`.
+"""
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from bot.db.models import Transaction
+from bot.money import Money
+
+ROW_COUNTS = (100, 1_000, 10_000)
+START = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def make_rows(count: int) -> List[Dict]:
+    return [
+        {
+            "user_id": 1,
+            "storage_id": 1,
+            "category_id": 1,
+            "currency_id": 1,
+            "timestamp": START + timedelta(days=i),
+            "amount": Money(-999)
+        }
+        for i in range(count)
+    ]
+
+
+def insert_orm(session: Session, rows: List[Dict]) -> None:
+    session.add_all([Transaction(**row) for row in rows])
+    session.flush()
+
+
+def insert_core(session: Session, rows: List[Dict]) -> None:
+    session.execute(insert(Transaction), rows)
+
+
+def measure(insert_func, rows: List[Dict]) -> float:
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        # BIGINT identity of Postgres; in SQLite only INTEGER PRIMARY KEY autoincrements
+        conn.execute(text(
+            'CREATE TABLE "transaction" (transaction_id INTEGER PRIMARY KEY, user_id INTEGER, storage_id INTEGER, '
+            'category_id INTEGER, currency_id INTEGER, timestamp DATETIME, amount NUMERIC(15, 2))'
+        ))
+    with Session(engine) as session:
+        started = time.perf_counter()
+        insert_func(session, rows)
+        session.commit()
+        elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    print(f"{'rows':>6} {'orm, ms':>9} {'core, ms':>9} {'speedup':>8}")
+    for count in ROW_COUNTS:
+        rows = make_rows(count)
+        orm = measure(insert_orm, rows)
+        core = measure(insert_core, rows)
+        print(f"{count:>6} {orm * 1000:>9.1f} {core * 1000:>9.1f} {orm / core:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
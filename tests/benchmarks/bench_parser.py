@@ -0,0 +1,71 @@
+"""
+Compares the single-pass transaction parser (`parse_transaction_lines`, run once by `TransactionFilter`)
+with the previous two-pass path: `re.fullmatch` in the filter, then again in the handler, and `assume_sign` via float.
+Only parsing is measured; slot resolution is the same in both.
+
+Run with `python -m tests.benchmarks.bench_parser`.
+"""
+import random
+import re
+import timeit
+from typing import List, Optional, Tuple
+
+from bot.utils.transaction import parse_transaction_lines
+
+MESSAGE_COUNTS = (100, 1_000, 10_000)
+SEED = 20240101
+LEGACY_TRANSACTION_PATTERN = re.compile(
+    r"([+-]?\d+(?:\.\d{,2})?)"  # amount (required)
+    r"(?:/(\d+))?"  # months for installment payments (optional)
+    r"(?:\s+([\w\-.]+))?"  # currency (optional)
+    r"(?:\s+([\w\-.]+))?"  # storage (optional)
+    r"(?:\s+([\w\-.]+))?"  # category (optional)
+)
+
+
+def assume_sign_float(money: str) -> float:
+    """Previous `assume_sign`."""
+    return float(money) if '+' in money or '-' in money else -float(money)
+
+
+def parse_two_pass(text: str) -> Optional[Tuple[float, int, Optional[str], Optional[str], Optional[str]]]:
+    """Previous implementation: the filter and the handler each match the whole message."""
+    if re.fullmatch(LEGACY_TRANSACTION_PATTERN, text) is None:  # TransactionFilter
+        return None
+    match = re.fullmatch(LEGACY_TRANSACTION_PATTERN, text)  # parse_and_add_transactions
+    amount_total, months, slot_0, slot_1, slot_2 = match.groups()
+    return assume_sign_float(amount_total), 1 if months is None else int(months), slot_0, slot_1, slot_2
+
+
+def make_messages(count: int) -> List[str]:
+    rng = random.Random(SEED)
+    names = ["usd", "eur", "wallet", "card", "food", "rent", "кафе", "taxi"]
+    messages = []
+    for _ in range(count):
+        amount = f"{rng.choice(['', '+', '-'])}{rng.randint(1, 100_000)}.{rng.randint(0, 99):02d}"
+        months = f"/{rng.randint(2, 24)}" if rng.random() < 0.2 else ""
+        messages.append(" ".join([amount + months, *rng.sample(names, rng.randint(0, 3))]))
+    return messages
+
+
+def check_same_result(messages: List[str]) -> None:
+    for message in messages:
+        (_, parsed), = parse_transaction_lines(message)
+        amount, months, *slots = parse_two_pass(message)
+        assert parsed.amount.cents == round(amount * 100), message
+        assert (parsed.months, parsed.slots) == (months, tuple(slots)), message
+
+
+def main(number: int = 5) -> None:
+    print(f"{'messages':>8} {'two-pass, ms':>13} {'single-pass, ms':>16} {'speedup':>8} {'messages/s':>11}")
+    for count in MESSAGE_COUNTS:
+        messages = make_messages(count)
+        check_same_result(messages)
+        two_pass = timeit.timeit(lambda: [parse_two_pass(m) for m in messages], number=number) / number
+        single_pass = timeit.timeit(lambda: [parse_transaction_lines(m) for m in messages], number=number) / number
+        print(f"{count:>8} {two_pass * 1000:>13.2f} {single_pass * 1000:>16.2f} {two_pass / single_pass:>7.1f}x "
+              f"{count / single_pass:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
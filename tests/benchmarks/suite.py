@@ -0,0 +1,396 @@
+"""
+Micro-benchmarks of the hot paths that don't need a database: transaction pattern matching, parsing and resolving
+transaction messages, installment splitting, recurrent timestamps, and list rendering.
+
+The working tree is compared with a baseline git ref (`HEAD` by default), checked out into a temporary worktree
+and measured in the same run: each side runs in its own process, every benchmark is sampled `--samples` times
+alternating between the sides, and the best time of each side is kept. The run fails if any benchmark got slower than the baseline by more than
+`--threshold`. Benchmarks that can't run against the baseline (e.g. added since) are reported but not compared.
+
+Run with `python -m tests.benchmarks.suite [--baseline-ref main] [--threshold 0.25] [-k pattern]`.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from bot.db.models import Category, Recurrent, Storage
+from bot.filters.filters import TransactionFilter
+from bot.money import Money
+from bot.services import currency_registry
+from bot.services.currency_registry import CurrencyRecord, CurrencyRegistry
+from bot.services.repository import NewTransaction
+from bot.services.snapshot import AliasRecord, CategoryRecord, ResolutionSnapshot, StorageRecord
+from bot.utils.list_models import (
+    _format_alias,
+    _format_balance,
+    _format_category,
+    _format_recurrent_transaction,
+    _format_storage,
+    _format_transaction
+)
+from bot.utils.parse_transaction import add_parsed_transactions
+from bot.utils.recurrent import recurrent_timestamps
+from bot.utils.transaction import parse_transaction_lines, split_transaction
+
+DEFAULT_THRESHOLD = 0.25
+SEED = 20240101
+LIST_SIZE = 1_000
+MESSAGE_COUNT = 1_000
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+Benchmark = Callable[[], Any]
+BENCHMARKS: Dict[str, Callable[[], Benchmark]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Benchmark]], Callable[[], Benchmark]]:
+    """Registers a setup function, which prepares the data and returns the callable to be timed."""
+    def register(setup: Callable[[], Benchmark]) -> Callable[[], Benchmark]:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class FakeRepository:
+    """Stands in for `Repository` in `add_parsed_transactions`, collecting the rows it would insert."""
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+
+    async def add_transaction_batch(
+            self,
+            user_id: int,
+            transactions: Iterable[NewTransaction],
+            return_ids: bool = False
+    ) -> None:
+        for t in transactions:
+            timestamps, amounts = await split_transaction(t.amount_total, t.months)
+            self.rows.extend(
+                (user_id, t.storage_id, t.category_id, t.currency_id, timestamp, amount)
+                for timestamp, amount in zip(timestamps, amounts)
+            )
+
+
+def make_snapshot() -> ResolutionSnapshot:
+    currency_registry._registry = CurrencyRegistry([
+        CurrencyRecord(1, 1, "US Dollar", "$", "USD"),
+        CurrencyRecord(2, 2, "Euro", "€", "EUR"),
+        CurrencyRecord(3, 3, "Russian Ruble", "₽", "RUB"),
+    ])
+    storages = [StorageRecord(100 + i, 100 + i, i + 1, f"storage{i}", i % 3 == 0, i % 4 == 0) for i in range(10)]
+    categories = [CategoryRecord(200 + i, 200 + i, i + 1, f"category{i}", i % 5 != 0) for i in range(20)]
+    aliases = [
+        *(AliasRecord(300 + i, s.aliasable_id, "storage", i + 1, f"s{i}") for i, s in enumerate(storages)),
+        *(AliasRecord(400 + i, c.aliasable_id, "category", 11 + i, f"c{i}") for i, c in enumerate(categories)),
+        AliasRecord(500, 1, "currency", 31, "bucks"),
+    ]
+    return ResolutionSnapshot(
+        user_id=1,
+        version=1,
+        default_category_id=categories[1].category_id,
+        default_storage_id=storages[1].storage_id,
+        default_currency_id=1,
+        storages=storages,
+        categories=categories,
+        aliases=aliases
+    )
+
+
+def make_messages(snapshot: ResolutionSnapshot, count: int) -> List[str]:
+    """Transaction messages in every supported form, all resolvable against `snapshot`."""
+    rng = random.Random(SEED)
+    currencies = ["usd", "EUR", "bucks"]
+    storages = [s.name for s in snapshot.storages] + [a.name for a in snapshot.aliases if a.aliasable_subtype == "storage"]
+    categories = [c.name for c in snapshot.categories] + [a.name for a in snapshot.aliases if a.aliasable_subtype == "category"]
+    messages = []
+    for _ in range(count):
+        amount = f"{rng.choice(['', '+', '-'])}{rng.randint(1, 100_000)}.{rng.randint(0, 99):02d}"
+        months = f"/{rng.randint(2, 24)}" if rng.random() < 0.2 else ""
+        slots = rng.choice([
+            [],
+            [rng.choice(categories)],
+            [rng.choice(storages), rng.choice(categories)],
+            [rng.choice(currencies), rng.choice(storages), rng.choice(categories)],
+        ])
+        messages.append(" ".join([amount + months, *slots]))
+    return messages
+
+
+@benchmark("transaction_pattern.fullmatch")
+def bench_transaction_pattern() -> Benchmark:
+    messages = make_messages(make_snapshot(), MESSAGE_COUNT) + ["not a transaction"] * 100
+    pattern = TransactionFilter.transaction_pattern
+    return lambda: [re.fullmatch(pattern, m) for m in messages]
+
+
+@benchmark("parse_and_add_transactions")
+def bench_parse_and_add_transactions() -> Benchmark:
+    snapshot = make_snapshot()
+    messages = make_messages(snapshot, MESSAGE_COUNT)
+    loop = asyncio.new_event_loop()
+
+    async def run() -> None:
+        repo = FakeRepository()
+        for message in messages:
+            await add_parsed_transactions(parse_transaction_lines(message), snapshot=snapshot, repo=repo)
+
+    return lambda: loop.run_until_complete(run())
+
+
+@benchmark("parse_and_add_transactions.batch")
+def bench_parse_and_add_transaction_batch() -> Benchmark:
+    """Same messages as above, sent 100 lines per message."""
+    snapshot = make_snapshot()
+    messages = make_messages(snapshot, MESSAGE_COUNT)
+    batches = ["\n".join(messages[i:i + 100]) for i in range(0, len(messages), 100)]
+    loop = asyncio.new_event_loop()
+
+    async def run() -> None:
+        repo = FakeRepository()
+        for batch in batches:
+            await add_parsed_transactions(parse_transaction_lines(batch), snapshot=snapshot, repo=repo)
+
+    return lambda: loop.run_until_complete(run())
+
+
+@benchmark("money.split.1200")
+def bench_money_split() -> Benchmark:
+    amount = Money(-12_345_678)
+    return lambda: amount.split(1200)
+
+
+@benchmark("split_transaction.600")
+def bench_split_transaction() -> Benchmark:
+    loop = asyncio.new_event_loop()
+    start = datetime(2020, 1, 31, 9)
+    return lambda: loop.run_until_complete(split_transaction(Money(-12_345_678), 600, start))
+
+
+@benchmark("recurrent_timestamps.day.5y")
+def bench_recurrent_days() -> Benchmark:
+    start = NOW.replace(year=NOW.year - 5)
+    return lambda: recurrent_timestamps(start, start, 1, "day", NOW)
+
+
+@benchmark("recurrent_timestamps.week.20y")
+def bench_recurrent_weeks() -> Benchmark:
+    start = NOW.replace(year=NOW.year - 20)
+    return lambda: recurrent_timestamps(start, start, 1, "week", NOW)
+
+
+@benchmark("recurrent_timestamps.month.20y")
+def bench_recurrent_months() -> Benchmark:
+    start = NOW.replace(year=NOW.year - 20, day=31, month=1)
+    return lambda: recurrent_timestamps(start, start, 1, "month", NOW)
+
+
+@benchmark("format.categories")
+def bench_format_categories() -> Benchmark:
+    categories = [Category(category_id=i, number=i, name=f"category{i}", factor_in=True) for i in range(LIST_SIZE)]
+    default = categories[LIST_SIZE // 2]
+    return lambda: '\n'.join([_format_category(c, default) for c in categories])
+
+
+@benchmark("format.storages")
+def bench_format_storages() -> Benchmark:
+    storages = [
+        Storage(storage_id=i, number=i, name=f"storage{i}", is_credit=i % 3 == 0, multicurrency=i % 4 == 0)
+        for i in range(LIST_SIZE)
+    ]
+    default = storages[LIST_SIZE // 2]
+    return lambda: '\n'.join([_format_storage(s, default) for s in storages])
+
+
+@benchmark("format.aliases")
+def bench_format_aliases() -> Benchmark:
+    aliases = [{"alias_number": i, "alias_name": f"a{i}", "name": f"category{i}"} for i in range(LIST_SIZE)]
+    return lambda: '\n'.join([_format_alias(a) for a in aliases])
+
+
+@benchmark("format.balances")
+def bench_format_balances() -> Benchmark:
+    balances = [{"amount": Money(-123_450 + i * 100), "currency_symbol": "$"} for i in range(LIST_SIZE)]
+    return lambda: '\n'.join([_format_balance(b) for b in balances])
+
+
+@benchmark("format.transactions")
+def bench_format_transactions() -> Benchmark:
+    transactions = [
+        {
+            "timestamp": NOW - timedelta(hours=i),
+            "amount": Money(-999 * i),
+            "currency_symbol": "$",
+            "storage_name": f"storage{i % 10}",
+            "category_name": f"category{i % 20}"
+        }
+        for i in range(LIST_SIZE)
+    ]
+    return lambda: '\n'.join([_format_transaction(t) for t in transactions])
+
+
+@benchmark("format.recurrent_transactions")
+def bench_format_recurrent_transactions() -> Benchmark:
+    recurrent_transactions = [
+        {
+            "Recurrent": Recurrent(
+                number=i, name=f"recurrent{i}", amount=Money(-999 * i), period=1, period_unit="month"
+            ),
+            "currency_symbol": "$",
+            "storage_name": f"storage{i % 10}",
+            "category_name": f"category{i % 20}"
+        }
+        for i in range(LIST_SIZE)
+    ]
+    return lambda: '\n'.join([_format_recurrent_transaction(rt) for rt in recurrent_transactions])
+
+
+class Worker:
+    """This suite running in its own process against `tree`, timing one benchmark per request."""
+
+    def __init__(self, tree: Path, min_time: float):
+        self.tree = tree
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", __spec__.name, "--worker", "--min-time", str(min_time)],
+            cwd=tree, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+
+    def measure(self, name: str) -> Optional[float]:
+        try:
+            self.process.stdin.write(name + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        except BrokenPipeError:
+            line = ""
+        if not line:  # e.g. the suite doesn't import against an older tree
+            raise RuntimeError(f"Benchmark worker in {self.tree} exited with code {self.process.wait()}")
+        return json.loads(line)
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.process.wait()
+
+
+def serve(min_time: float) -> None:
+    """Worker loop: reads benchmark names, prints the time per call of one run of at least `min_time` seconds.
+    Benchmarks that fail (e.g. against an older tree) are reported as `null`."""
+    timers: Dict[str, Tuple[timeit.Timer, int]] = {}
+    failed = set()
+    for line in sys.stdin:
+        name = line.strip()
+        if name in failed:
+            print(json.dumps(None), flush=True)
+            continue
+        try:
+            if name not in timers:
+                timer = timeit.Timer(BENCHMARKS[name]())
+                number, elapsed = timer.autorange()
+                timers[name] = timer, max(number, int(number * min_time / elapsed) if elapsed else number)
+            timer, number = timers[name]
+            seconds = timer.timeit(number) / number
+        except Exception as e:
+            print(f"{name}: {type(e).__name__}: {e}", file=sys.stderr)
+            failed.add(name)
+            seconds = None
+        print(json.dumps(seconds), flush=True)
+
+
+def git(*args: str, cwd: Path) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def checkout_baseline(repo: Path, ref: str, path: Path) -> None:
+    """Checks `ref` out into a worktree at `path`, with this suite in it so both sides run the same benchmarks."""
+    git("worktree", "add", "--detach", str(path), ref, cwd=repo)
+    suite_path = path / Path(__file__).relative_to(repo)
+    suite_path.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(__file__, suite_path)
+
+
+def run(
+        names: List[str],
+        baseline_ref: str,
+        samples: int,
+        min_time: float
+) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Best times of the working tree and of `baseline_ref` out of `samples` runs each.
+    The two sides are sampled alternately, benchmark by benchmark, so that both see the same machine load.
+    """
+    repo = Path(git("rev-parse", "--show-toplevel", cwd=Path(__file__).parent))
+    best: Tuple[Dict[str, float], Dict[str, float]] = ({}, {})
+    with tempfile.TemporaryDirectory(prefix="benchmark-baseline-") as tmp:
+        baseline_tree = Path(tmp) / "tree"
+        checkout_baseline(repo, baseline_ref, baseline_tree)
+        workers = [Worker(repo, min_time), Worker(baseline_tree, min_time)]
+        try:
+            for name in names:
+                sides = [(0, workers[0]), (1, workers[1])]
+                for sample in range(samples):
+                    for side, worker in sides if sample % 2 == 0 else reversed(sides):
+                        seconds = worker.measure(name)
+                        if seconds is not None:
+                            best[side][name] = min(seconds, best[side].get(name, seconds))
+        finally:
+            for worker in workers:
+                worker.close()
+            git("worktree", "remove", "--force", str(baseline_tree), cwd=repo)
+    return best
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    """Prints the results next to the baseline and returns names of the benchmarks that regressed."""
+    regressions = []
+    print(f"{'benchmark':<36} {'time, us':>12} {'baseline, us':>13} {'change':>8}")
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds is None:
+            print(f"{name:<36} {seconds * 1e6:>12.1f} {'-':>13} {'new':>8}")
+            continue
+        change = seconds / baseline_seconds - 1
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"{name:<36} {seconds * 1e6:>12.1f} {baseline_seconds * 1e6:>13.1f} {change:>+8.1%}"
+              f"{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--baseline-ref", default="HEAD", help="git ref to compare with (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown relative to the baseline (default: %(default)s, i.e. 25%%)")
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose names match this regex")
+    parser.add_argument("--samples", type=int, default=9, help="runs of each benchmark per side (default: %(default)s)")
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per run (default: %(default)s)")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        serve(args.min_time)
+        return 0
+
+    names = [name for name in BENCHMARKS if not args.pattern or re.search(args.pattern, name)]
+    results, baseline = run(names, args.baseline_ref, samples=args.samples, min_time=args.min_time)
+    print(f"Compared with {args.baseline_ref}, best of {args.samples} alternating runs")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
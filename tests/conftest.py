@@ -0,0 +1,12 @@
+import pytest
+
+from bot.db.query_log import assert_max_queries
+
+
+@pytest.fixture
+def max_queries():
+    """
+    Usage: `with max_queries(session, 2): await handler(...)`.
+    The session's engine must have `bot.db.query_log.install_query_logging` applied.
+    """
+    return assert_max_queries
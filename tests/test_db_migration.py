@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+from sqlalchemy import Column, Index, Integer, MetaData, String, Table, UniqueConstraint, create_engine, select, text
+
+from bot.filters.filters import NameFilter
+from bot.utils.db import _create_missing_indexes_and_constraints
+from bot.utils.transaction import parse_transaction
+
+
+def _category_table(metadata: MetaData, *args) -> Table:
+    """Same shape as `category`, without the Postgres-only column types and deferrable constraints."""
+    return Table(
+        "category", metadata,
+        Column("category_id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("aliasable_id", Integer, nullable=False),
+        Column("number", Integer, nullable=False),
+        Column("name", String(40), nullable=False),
+        *args
+    )
+
+
+def _migrate(rows, *unique_keys) -> tuple:
+    """Creates the table without `unique_keys`, fills it with `rows`, then migrates it to the schema with them."""
+    engine = create_engine("sqlite://")
+    old_table = _category_table(MetaData())
+    old_table.create(engine)
+    with engine.begin() as conn:
+        conn.execute(old_table.insert(), rows)
+    new_metadata = MetaData()
+    new_table = _category_table(new_metadata, *unique_keys)
+    with engine.begin() as conn:
+        _create_missing_indexes_and_constraints(conn, new_metadata)
+    with engine.connect() as conn:
+        result = conn.execute(
+            select(new_table.c.category_id, new_table.c.number, new_table.c.name).order_by(new_table.c.category_id)
+        ).all()
+        index_names = {row.name for row in conn.execute(text("PRAGMA index_list('category')"))}
+    return [tuple(row) for row in result], index_names
+
+
+def _rows(*values):
+    return [
+        {"category_id": category_id, "user_id": user_id, "aliasable_id": category_id, "number": number, "name": name}
+        for category_id, user_id, number, name in values
+    ]
+
+
+def test_duplicate_numbers_are_renumbered():
+    rows, index_names = _migrate(
+        _rows((1, 1, 1, "a"), (2, 1, 2, "b"), (3, 1, 2, "c"), (4, 1, 3, "d"), (5, 2, 1, "e"), (6, 2, 5, "f")),
+        Index("uq_category_user_id_number", "user_id", "number", unique=True)
+    )
+    assert rows == [(1, 1, "a"), (2, 2, "b"), (3, 3, "c"), (4, 4, "d"), (5, 1, "e"), (6, 5, "f")]
+    assert "uq_category_user_id_number" in index_names
+
+
+def test_names_differing_by_case_get_suffixes():
+    long_name = "x" * 40
+    rows, index_names = _migrate(
+        _rows(
+            (1, 1, 1, "Food"), (2, 1, 2, "food"), (3, 1, 3, "FOOD"), (4, 1, 4, "food_2"),
+            (5, 1, 5, long_name), (6, 1, 6, long_name), (7, 2, 1, "food")
+        ),
+        Index("uq_category_user_id_lower_name", "user_id", text("lower(name)"), unique=True)
+    )
+    assert rows == [
+        (1, 1, "Food"), (2, 2, "food_3"), (3, 3, "FOOD_4"), (4, 4, "food_2"),
+        (5, 5, long_name), (6, 6, "x" * 38 + "_2"), (7, 1, "food")
+    ]
+    assert "uq_category_user_id_lower_name" in index_names
+
+
+def test_renamed_names_can_still_be_referenced():
+    rows, _ = _migrate(
+        _rows((1, 1, 1, "Wallet"), (2, 1, 2, "wallet"), (3, 1, 3, "x-y." * 10), (4, 1, 4, "X-Y." * 10)),
+        Index("uq_category_user_id_lower_name", "user_id", text("lower(name)"), unique=True)
+    )
+    renamed = [name for _, _, name in rows[1::2]]
+    assert renamed == ["wallet_2", "X-Y." * 9 + "X-_2"]
+    for name in renamed:
+        assert asyncio.run(NameFilter()(SimpleNamespace(text=name)))
+        parsed = parse_transaction(f"10 usd {name}")
+        assert parsed is not None and parsed.slots[1] == name
+
+
+def test_unresolvable_duplicates_are_skipped(caplog):
+    with caplog.at_level(logging.ERROR):
+        rows, index_names = _migrate(
+            _rows((1, 1, 1, "a"), (2, 2, 1, "b")) + [
+                {"category_id": 3, "user_id": 3, "aliasable_id": 1, "number": 1, "name": "c"}
+            ],
+            UniqueConstraint("aliasable_id", name="uq_category_aliasable_id"),
+            Index("uq_category_user_id_lower_name", "user_id", text("lower(name)"), unique=True)
+        )
+    assert "Not creating `uq_category_aliasable_id`" in caplog.text
+    assert "uq_category_user_id_lower_name" in index_names
+    assert rows == [(1, 1, "a"), (2, 1, "b"), (3, 1, "c")]
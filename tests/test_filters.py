@@ -0,0 +1,14 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from bot.filters.filters import PeriodicityFilter
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1d", True), ("2w", True), ("12m", True), ("1y", True), ("01d", True),
+    ("0d", False), ("00m", False), ("d", False), ("1x", False), ("-1d", False)
+])
+def test_periodicity_filter(text, expected):
+    assert asyncio.run(PeriodicityFilter()(SimpleNamespace(text=text))) is expected
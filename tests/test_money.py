@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from bot.db.types import MoneyType
+from bot.money import Money
+
+
+@pytest.mark.parametrize("text, cents", [
+    ("12", 1200),
+    ("12.", 1200),
+    ("12.5", 1250),
+    ("12.34", 1234),
+    ("-0.07", -7),
+    ("+3.10", 310),
+    ("0.005", 1),  # rounded half up
+    ("-1.234", -123),
+    ("1e3", 100000),
+])
+def test_from_str(text, cents):
+    assert Money.from_str(text) == Money(cents)
+
+
+@pytest.mark.parametrize("cents, text", [
+    (0, "0.00"), (7, "0.07"), (-7, "-0.07"), (123456, "1234.56"), (-100, "-1.00"),
+    (10 ** 15 - 1, "9999999999999.99"), (-(10 ** 15 - 1), "-9999999999999.99")  # NUMERIC(15, 2) bounds
+])
+def test_str_and_format(cents, text):
+    assert str(Money(cents)) == text
+    assert f"{Money(cents)}" == text
+    assert f"{Money(cents):.2f}" == text
+    assert f"{Money(cents):>10}" == f"{Decimal(text):>10}"
+    assert Money.from_str(text) == Money(cents)
+
+
+@pytest.mark.parametrize("cents", [1, 99, 100, 101, 123_456_789, -1, -101, -123_456_789])
+@pytest.mark.parametrize("parts", [1, 2, 3, 7, 12, 600])
+def test_split_conserves_sum(cents, parts):
+    amounts = Money(cents).split(parts)
+    assert len(amounts) == parts
+    assert sum(amounts) == Money(cents)
+    assert max(amounts) - min(amounts) <= Money(1)
+
+
+def test_arithmetic():
+    assert Money(150) + Money(-50) == Money(100)
+    assert Money(150) - Money(200) == Money(-50)
+    assert -Money(5) == Money(-5)
+    assert 3 * Money(5) == Money(5) * 3 == Money(15)
+    assert sum([Money(1), Money(2)]) == Money(3)
+    assert not Money(0)
+    assert len({Money(1), Money(1), Money(2)}) == 2
+    with pytest.raises(AttributeError):
+        Money(1).cents = 2
+
+
+def test_money_type_round_trip():
+    money_type = MoneyType()
+    dialect = postgresql.asyncpg.dialect()
+    assert money_type.process_bind_param(Money(-1234), dialect) == Decimal("-12.34")
+    assert money_type.process_result_value(Decimal("-12.34"), dialect) == Money(-1234)
+    assert money_type.process_result_value(Decimal("1000.00"), dialect) == Money(100000)
+    assert money_type.process_bind_param(None, dialect) is None
@@ -0,0 +1,85 @@
+"""
+Query budgets of the hot paths, checked against a real database.
+Set `TEST_POSTGRES_DSN` (e.g. `postgresql+asyncpg://postgres@localhost:5432/shekels_test`) to run them;
+all tables of that database are dropped and recreated.
+"""
+import asyncio
+import os
+from typing import Awaitable, Callable
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from bot.db.base import Base
+from bot.db.models import User
+from bot.db.query_log import install_query_logging
+from bot.services.currency_registry import load_currency_registry
+from bot.services.repository import Repository
+from bot.utils.db import add_and_init_user, drop_all_tables, init_database
+from bot.utils.parse_transaction import add_parsed_transactions
+from bot.utils.transaction import parse_transaction_lines
+
+TEST_POSTGRES_DSN = os.environ.get("TEST_POSTGRES_DSN")
+TELEGRAM_ID = 1
+
+pytestmark = pytest.mark.skipif(not TEST_POSTGRES_DSN, reason="TEST_POSTGRES_DSN is not set")
+
+Scenario = Callable[[async_sessionmaker[AsyncSession], User], Awaitable[None]]
+
+
+def run(scenario: Scenario) -> None:
+    """Runs `scenario` against a fresh database with a single onboarded user."""
+    async def main() -> None:
+        engine = create_async_engine(TEST_POSTGRES_DSN)
+        install_query_logging(engine)
+        session_pool = async_sessionmaker(engine, expire_on_commit=False)
+        try:
+            await drop_all_tables(engine)
+            await init_database(Base.metadata, engine, session_pool)
+            await load_currency_registry(session_pool)
+            async with session_pool.begin() as session:
+                repo = Repository(session)
+                user = await add_and_init_user(TELEGRAM_ID, "test", banned=False, repo=repo)
+                await repo.set_default_currency(user.user_id, "USD")
+            await scenario(session_pool, user)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
+
+
+def test_load_user_context(max_queries):
+    async def scenario(session_pool, user):
+        async with session_pool() as session:
+            with max_queries(session, 1):
+                user_ctx = await Repository(session).load_user_context(TELEGRAM_ID)
+        assert user_ctx.user.user_id == user.user_id
+
+    run(scenario)
+
+
+def test_load_user_context_over_budget_fails(max_queries):
+    async def scenario(session_pool, user):
+        async with session_pool() as session:
+            with pytest.raises(AssertionError, match="Expected at most 0 queries, 1 were executed"):
+                with max_queries(session, 0):
+                    await Repository(session).load_user_context(TELEGRAM_ID)
+
+    run(scenario)
+
+
+@pytest.mark.parametrize("text", ["12.50", "12.50\n-3 Wallet\n+100\n600/3 usd Wallet Uncategorized"])
+def test_add_transactions(max_queries, text):
+    """Whatever the number of lines and installments: transactions, balances, monthly rollups."""
+    async def scenario(session_pool, user):
+        async with session_pool.begin() as session:
+            repo = Repository(session)
+            with max_queries(session, 4):
+                user_ctx = await repo.load_user_context(TELEGRAM_ID)
+                added, errors = await add_parsed_transactions(
+                    parse_transaction_lines(text), snapshot=user_ctx.snapshot, repo=repo
+                )
+        assert errors == []
+        assert added == len(text.splitlines())
+
+    run(scenario)
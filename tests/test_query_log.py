@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+import pytest
+from aiogram.dispatcher.event.handler import HandlerObject
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from bot.db.query_log import install_query_logging, fingerprint
+from bot.middlewares.query_budget import QueryBudgetMiddleware
+from bot.tools.loadgen import QueryCountMiddleware
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    install_query_logging(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_fingerprint_normalizes_literals_and_parameters():
+    assert fingerprint("SELECT *\n  FROM storage WHERE user_id = $1 AND number = 3") == \
+        fingerprint("SELECT * FROM storage WHERE user_id = $2 AND number = 15")
+    assert fingerprint("INSERT INTO t (a, b) VALUES ($1, $2), ($3, $4)") == "INSERT INTO t (a, b) VALUES (...)"
+
+
+def test_within_budget(engine, max_queries):
+    with Session(engine) as session:
+        with max_queries(session, 2) as log:
+            session.execute(text("SELECT 1"))
+            session.execute(text("SELECT 2"))
+    assert len(log) == 2
+
+
+def test_over_budget_reports_repeated_statements(engine, max_queries):
+    with Session(engine) as session:
+        with pytest.raises(AssertionError, match=r"3 x SELECT \?"):
+            with max_queries(session, 2):
+                for i in range(3):
+                    session.execute(text(f"SELECT {i}"))
+
+
+def test_log_is_not_leaked_to_the_next_checkout(engine, max_queries):
+    with Session(engine) as session:
+        with max_queries(session, 1) as log:
+            session.execute(text("SELECT 1"))
+    with Session(engine) as session:
+        session.execute(text("SELECT 1"))
+    assert len(log) == 1
+
+
+def test_middlewares_share_one_log(engine, caplog):
+    count_middleware = QueryCountMiddleware()
+    budget_middleware = QueryBudgetMiddleware(budget=1)
+
+    async def handle(event, data):
+        data["session"].execute(text("SELECT 1"))
+        data["session"].execute(text("SELECT 2"))
+
+    async def budgeted(event, data):
+        data["session"].execute(text("SELECT 0"))  # e.g. by an outer middleware, before the budget is checked
+        return await budget_middleware(handle, event, data)
+
+    with Session(engine) as session:
+        with caplog.at_level(logging.WARNING):
+            asyncio.run(count_middleware(budgeted, None, {"session": session, "handler": HandlerObject(callback=handle)}))
+    assert count_middleware.counts == [3]
+    assert "executed 3 queries (budget 1)" in caplog.text
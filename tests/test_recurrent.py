@@ -0,0 +1,88 @@
+from calendar import monthrange
+from datetime import datetime, timezone
+
+import pytest
+
+from bot.utils.recurrent import count_recurrent_timestamps, iter_recurrent_timestamps, recurrent_timestamps
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def renew_in_chunks(start: datetime, period: int, period_unit: str, up_to: datetime, chunk: int) -> list:
+    """Renews the way `RecurrentScheduler` does: at most `chunk` occurrences at a time, saving the next timestamp."""
+    timestamps, next_timestamp = [], start
+    while True:
+        chunk_timestamps, next_timestamp = recurrent_timestamps(
+            start, next_timestamp, period, period_unit, up_to, limit=chunk
+        )
+        if not chunk_timestamps:
+            return timestamps
+        timestamps.extend(chunk_timestamps)
+
+
+@pytest.mark.parametrize("day", [29, 30, 31])
+def test_monthly_keeps_day_of_month(day):
+    start = utc(2023, 1, day, 9)
+    timestamps, next_timestamp = recurrent_timestamps(start, start, 1, "month", utc(2024, 12, 31, 23))
+    assert len(timestamps) == 24
+    for timestamp in timestamps:
+        assert timestamp.day == min(day, monthrange(timestamp.year, timestamp.month)[1])
+        assert (timestamp.hour, timestamp.minute) == (9, 0)
+    assert [t.day for t in timestamps[:4]] == [day, 28, day, 30 if day == 31 else day]
+    assert timestamps[13].day == min(day, 29)  # February 2024
+    assert next_timestamp == utc(2025, 1, day, 9)
+
+
+def test_yearly_from_leap_day():
+    start = utc(2020, 2, 29, 12)
+    timestamps, next_timestamp = recurrent_timestamps(start, start, 1, "year", utc(2028, 3, 1))
+    assert [(t.year, t.month, t.day) for t in timestamps] == [
+        (2020, 2, 29), (2021, 2, 28), (2022, 2, 28), (2023, 2, 28), (2024, 2, 29),
+        (2025, 2, 28), (2026, 2, 28), (2027, 2, 28), (2028, 2, 29)
+    ]
+    assert next_timestamp == utc(2029, 2, 28, 12)
+
+
+@pytest.mark.parametrize("start, period, period_unit", [
+    (utc(2020, 1, 31, 9), 1, "month"),
+    (utc(2020, 1, 30, 9), 1, "month"),
+    (utc(2020, 1, 29, 9), 1, "month"),
+    (utc(2020, 8, 31, 9), 3, "month"),
+    (utc(2020, 2, 29, 9), 1, "year"),
+    (utc(2020, 1, 31, 9), 1, "day"),
+    (utc(2020, 1, 31, 9), 2, "week"),
+])
+@pytest.mark.parametrize("chunk", [1, 2, 5, 7])
+def test_chunked_renewal_gives_the_same_timestamps(start, period, period_unit, chunk):
+    up_to = utc(2026, 3, 15)
+    expected, _ = recurrent_timestamps(start, start, period, period_unit, up_to)
+    assert renew_in_chunks(start, period, period_unit, up_to, chunk) == expected
+    assert list(iter_recurrent_timestamps(start, start, period, period_unit, up_to)) == expected
+
+
+def test_clamped_next_timestamp_does_not_shift_the_schedule():
+    start = utc(2024, 1, 31, 9)
+    timestamps, next_timestamp = recurrent_timestamps(start, start, 1, "month", utc(2024, 2, 15), limit=1)
+    assert timestamps == [start]
+    assert next_timestamp == utc(2024, 2, 29, 9)
+    # saved and renewed later, the schedule still follows the start day
+    timestamps, next_timestamp = recurrent_timestamps(start, next_timestamp, 1, "month", utc(2024, 5, 1))
+    assert timestamps == [utc(2024, 2, 29, 9), utc(2024, 3, 31, 9), utc(2024, 4, 30, 9)]
+    assert next_timestamp == utc(2024, 5, 31, 9)
+
+
+def test_next_timestamp_drifted_by_earlier_renewals_gets_back_on_schedule():
+    # saved by the previous implementation, which accumulated clamping: Jan 31 -> Feb 29 -> Mar 29
+    start = utc(2024, 1, 31, 9)
+    timestamps, next_timestamp = recurrent_timestamps(start, utc(2024, 3, 29, 9), 1, "month", utc(2024, 5, 1))
+    assert timestamps == [utc(2024, 3, 31, 9), utc(2024, 4, 30, 9)]
+    assert next_timestamp == utc(2024, 5, 31, 9)
+
+
+def test_count_before_start():
+    start = utc(2024, 1, 31, 9)
+    assert count_recurrent_timestamps(start, 1, "month", utc(2024, 1, 31, 8)) == 0
+    assert count_recurrent_timestamps(start, 1, "month", start) == 1
+    assert recurrent_timestamps(start, start, 1, "month", utc(2024, 1, 1)) == ([], start)
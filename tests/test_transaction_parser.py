@@ -0,0 +1,104 @@
+"""
+Property-style tests of the transaction parser on a seeded random corpus: every generated valid line must parse
+to the amount, months, and slots it was built from, and every corrupted line must be rejected.
+"""
+import random
+import re
+from decimal import Decimal
+from typing import List, Optional, Tuple
+
+import pytest
+
+from bot.money import Money
+from bot.utils.transaction import ParsedTransaction, assume_sign, parse_transaction, parse_transaction_lines
+
+SEED = 20240101
+CORPUS_SIZE = 5_000
+NAME_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-.абвгдеёжзийклмнопрстуфхцчшщъыьэюя"
+
+Line = Tuple[str, ParsedTransaction]
+
+
+def random_name(rng: random.Random) -> str:
+    return "".join(rng.choices(NAME_ALPHABET, k=rng.randint(1, 40)))
+
+
+def random_line(rng: random.Random) -> Line:
+    """A valid transaction line along with what it should parse to."""
+    sign = rng.choice(["", "+", "-"])
+    whole = str(rng.randint(0, 10 ** rng.randint(1, 12)))
+    fraction = rng.choice([None, "", str(rng.randint(0, 9)), f"{rng.randint(0, 99):02d}"])
+    amount = sign + whole + ("" if fraction is None else "." + fraction)
+    months = rng.choice([None, rng.randint(1, 600)])
+    slots = [random_name(rng) for _ in range(rng.randint(0, 3))]
+    separators = [rng.choice([" ", "  ", "\t", " \t "]) for _ in slots]
+    text = amount + ("" if months is None else f"/{months}") + "".join(s + n for s, n in zip(separators, slots))
+
+    cents = int(Decimal(amount.lstrip("+-") or "0") * 100)
+    expected = ParsedTransaction(
+        amount=Money(cents if sign == "+" else -cents),
+        months=1 if months is None else months,
+        slots=tuple(slots + [None] * (3 - len(slots)))
+    )
+    return text, expected
+
+
+def corrupt(rng: random.Random, text: str) -> str:
+    """Makes a valid line invalid."""
+    return rng.choice([
+        lambda: re.sub(r"^([+-]?\d+)(?:\.\d*)?", r"\1.123", text),  # three decimal places
+        lambda: "x" + text,
+        lambda: "." + text,
+        lambda: text + " one two three four",
+        lambda: text + " !",
+        lambda: text.split()[0].split("/")[0] + "/",
+        lambda: "/3 " + text,
+    ])()
+
+
+@pytest.fixture(scope="module")
+def corpus() -> List[Line]:
+    rng = random.Random(SEED)
+    return [random_line(rng) for _ in range(CORPUS_SIZE)]
+
+
+def test_valid_lines_parse_to_their_components(corpus):
+    for text, expected in corpus:
+        assert parse_transaction(text) == expected, text
+
+
+def test_amount_agrees_with_assume_sign(corpus):
+    for text, expected in corpus:
+        amount = text.split()[0].split("/")[0]
+        assert assume_sign(amount) == expected.amount, text
+
+
+def test_corrupted_lines_are_rejected(corpus):
+    rng = random.Random(SEED)
+    for text, _ in corpus:
+        corrupted = corrupt(rng, text)
+        assert parse_transaction(corrupted) is None, corrupted
+
+
+def test_more_than_two_decimal_places_are_rejected():
+    assert parse_transaction("12.345") is None
+    assert parse_transaction("12.34 usd") == ParsedTransaction(Money(-1234), 1, ("usd", None, None))
+
+
+def test_multiline_messages_keep_line_numbers(corpus):
+    rng = random.Random(SEED)
+    lines: List[Tuple[int, Optional[ParsedTransaction]]] = []
+    text_lines = []
+    for text, expected in corpus[:200]:
+        if rng.random() < 0.2:
+            text_lines.append(rng.choice(["", "   ", "\t"]))
+        if rng.random() < 0.2:
+            text, expected = corrupt(rng, text), None
+        text_lines.append(rng.choice(["", " "]) + text + rng.choice(["", " "]))
+        lines.append((len(text_lines), expected))
+    assert parse_transaction_lines("\n".join(text_lines)) == lines
+
+
+@pytest.mark.parametrize("text", ["", " ", "\n\n"])
+def test_blank_messages_have_no_lines(text):
+    assert parse_transaction_lines(text) == []